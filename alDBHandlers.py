@@ -18,6 +18,10 @@ class ALDBHandle:
         #   Query string formatted with args represented as '?'
         #   Preprocesses as needed and returns result of execute()
         raise Exception("Use of Abstract Base Class for ALDBHandle")
+    def executemany(self, query: str, argsList: list):
+        # Takes query string and a list of argument tuples as input.
+        #   Runs the query once per tuple as a single statement
+        raise Exception("Use of Abstract Base Class for ALDBHandle")
     def closeCursor(self):
         # Closes cursor and, if needed, disconnects fromn DB
         raise Exception("Use of Abstract Base Class for ALDBHandle")
@@ -27,6 +31,10 @@ class ALDBHandle:
     def closeDB(self):
         # Disconnects from DB
         raise Exception("Use of Abstract Base Class for ALDBHandle")
+    def getDataVersion(self):
+        # Returns a value that changes when another connection commits to the DB
+        #   Only meaningful for persistent handles
+        raise Exception("Use of Abstract Base Class for ALDBHandle")
 
 class SQLiteHandle(ALDBHandle):
     def __init__(self, dbConfig, persistence):
@@ -51,6 +59,8 @@ class SQLiteHandle(ALDBHandle):
             return self.cursor.execute(procQuery)
         else:
             return self.cursor.execute(procQuery, args)
+    def executemany(self, query, argsList):
+        return self.cursor.executemany(query, argsList)
     def closeCursor(self):
         self.cursor.close()
         if not self.persistence:
@@ -59,6 +69,13 @@ class SQLiteHandle(ALDBHandle):
         self.handle.commit()
     def closeDB(self):
         self.handle.close()
+    def getDataVersion(self):
+        self.openCursor()
+        dataVersion = None
+        for row in self.execute("PRAGMA data_version;"):
+            dataVersion = row[0]
+        self.closeCursor()
+        return dataVersion
 
 def getDBHandle(dbConfigDict, persistence=False):
     dbHandle = None
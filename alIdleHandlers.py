@@ -0,0 +1,90 @@
+import time
+from glueCodeTypes import IdleStrategy
+
+class ALIdleHandle:
+    """Abstract Base Class to Provide Interface to Idle Strategies
+
+    Decides how the glue loop waits between iterations that found no
+    work and tracks how long the loop spent idle versus working"""
+    def __init__(self, idleConfig: dict, wakeEvent=None):
+        # Optional threading.Event that cuts any wait short when set
+        self.wakeEvent = wakeEvent
+        self.minSleep = idleConfig.get("MinimumSleep", 0.001)
+        self.maxSleep = idleConfig.get("MaximumSleep", 0.1)
+        self.backoffFactor = idleConfig.get("BackoffFactor", 2.0)
+        self.sleepTime = self.minSleep
+        self.idleTime = 0.0
+        self.startTime = time.perf_counter()
+    def wait(self, foundWork: bool):
+        # Called once per loop iteration with whether that iteration had tasks
+        #   Blocks until the next iteration should start
+        raise Exception("Use of Abstract Base Class for ALIdleHandle")
+    def sleep(self, seconds):
+        # Returns True if woken by wakeEvent before seconds elapsed
+        if self.wakeEvent is None:
+            time.sleep(seconds)
+            return False
+        if self.wakeEvent.wait(seconds):
+            self.wakeEvent.clear()
+            return True
+        return False
+    def getTimes(self):
+        # Returns (idle seconds, working seconds) since construction
+        totalTime = time.perf_counter() - self.startTime
+        return (self.idleTime, totalTime - self.idleTime)
+
+class SpinIdleHandle(ALIdleHandle):
+    def wait(self, foundWork):
+        # Never waits, so loop immediately
+        pass
+
+class BackoffIdleHandle(ALIdleHandle):
+    def wait(self, foundWork):
+        if foundWork:
+            # More work is likely to follow so reset backoff and loop immediately
+            self.sleepTime = self.minSleep
+            return
+        idleStart = time.perf_counter()
+        wokenEarly = self.idle()
+        self.idleTime += time.perf_counter() - idleStart
+        if wokenEarly:
+            # Something landed so do not keep backing off
+            self.sleepTime = self.minSleep
+        else:
+            self.sleepTime = min(self.sleepTime * self.backoffFactor, self.maxSleep)
+    def idle(self):
+        # Returns True if woken before the full sleep elapsed
+        return self.sleep(self.sleepTime)
+
+class DataVersionIdleHandle(BackoffIdleHandle):
+    def __init__(self, idleConfig, dbHandle, wakeEvent=None):
+        # Call parent constructor
+        BackoffIdleHandle.__init__(self, idleConfig, wakeEvent)
+        # Needs a persistent handle as data_version is per connection
+        self.dbHandle = dbHandle
+        self.dataVersion = self.dbHandle.getDataVersion()
+    def idle(self):
+        # Checking data_version is far cheaper than the request queries, so
+        #  check it at the minimum interval and wake up as soon as it moves
+        deadline = time.perf_counter() + self.sleepTime
+        while time.perf_counter() < deadline:
+            nuDataVersion = self.dbHandle.getDataVersion()
+            if nuDataVersion != self.dataVersion:
+                self.dataVersion = nuDataVersion
+                return True
+            if self.sleep(self.minSleep):
+                return True
+        return False
+
+def getIdleHandle(idleConfigDict, dbHandle, wakeEvent=None):
+    idleHandle = None
+    idleStrategy = idleConfigDict.get("IdleStrategy", IdleStrategy.BACKOFF)
+    if idleStrategy == IdleStrategy.SPIN:
+        idleHandle = SpinIdleHandle(idleConfigDict, wakeEvent)
+    elif idleStrategy == IdleStrategy.BACKOFF:
+        idleHandle = BackoffIdleHandle(idleConfigDict, wakeEvent)
+    elif idleStrategy == IdleStrategy.DATAVERSION:
+        idleHandle = DataVersionIdleHandle(idleConfigDict, dbHandle, wakeEvent)
+    else:
+        raise Exception('Using Unsupported Idle Strategy')
+    return idleHandle
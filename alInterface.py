@@ -1,4 +1,6 @@
 from collections.abc import Iterable
+import collections
+import threading
 import os
 import stat
 import shutil
@@ -8,11 +10,17 @@ import subprocess
 import getpass
 import sys
 from writeBGKLammpsScript import check_zeros_trace_elements
-from glueCodeTypes import ALInterfaceMode, SolverCode, ResultProvenance, LearnerBackend, BGKInputs, BGKMassesInputs, BGKOutputs, BGKMassesOutputs, SchedulerInterface, ProvisioningInterface, DatabaseMode
-from contextlib import redirect_stdout
+from glueCodeTypes import ALInterfaceMode, SolverCode, ResultProvenance, LearnerBackend, BGKInputs, BGKMassesInputs, BGKOutputs, BGKMassesOutputs, SchedulerInterface, ProvisioningInterface, DatabaseMode, IngestionMode
 from Screened_Boltzman_solution import ICFAnalytical_solution
 from glueArgParser import processGlueCodeArguments
-from alDBHandlers import getDBHandle
+from alDBHandlers import getDBHandle, SQLiteHandle
+from alIdleHandlers import getIdleHandle
+from alProcessRunner import AsyncProcessRunner
+from glueIntervalSet import IntervalSet
+from glueSQLHelpers import getGNDInputColumns, getGNDRTreeColumns
+from glueGNDCache import GNDCache, getGNDCache
+from alModelTrainer import BackgroundTrainer
+from initTables import createSQLIndexes
 
 def getGroundishTruthVersion(packetType):
     if packetType == SolverCode.BGK:
@@ -23,48 +31,96 @@ def getGroundishTruthVersion(packetType):
         raise Exception('Using Unsupported Solver Code')
 
 def getSelString(packetType, latestID, missingIDs):
-    # TODO: Make this smarter
     minID = 0
     if len(missingIDs) == 0:
         minID = latestID + 1
     else:
-        minID = min(missingIDs)
+        minID = missingIDs.min()
     if packetType == SolverCode.BGK:
         return "SELECT * FROM BGKREQS WHERE RANK=? AND REQ>=" + str(minID) + "  AND TAG=?;"
     else:
         raise Exception('Using Unsupported Solver Code')
 
-def getGNDStringAndTuple(fgsArgs, configStruct):
-    selString = ""
-    selTup = ()
-    if isinstance(fgsArgs, BGKInputs):
-        # Percent error acceptable for a match
-        relError = configStruct['ICFParameters']['RelativeError']
-        # TODO: DRY this for later use
-        selString += "SELECT * FROM BGKGND WHERE "
-        #Temperature
+def getBatchedSelString(packetType):
+    # ROWID only grows on insert so it serves as a global high-water mark across all ranks
+    if packetType == SolverCode.BGK:
+        return "SELECT ROWID, * FROM BGKREQS WHERE ROWID>? AND TAG=?;"
+    else:
+        raise Exception('Using Unsupported Solver Code')
+
+def getRelErrorBounds(value, relError):
+    # Box of stored values COL with ABS(value - COL) / COL < relError
+    if relError >= 1.0:
+        # No upper bound on COL, so only bound from below
+        return (value / (1.0 + relError), None)
+    bounds = sorted([value / (1.0 + relError), value / (1.0 - relError)])
+    return (bounds[0], bounds[1])
+
+def getGNDBatchStrings(packetType):
+    # Returns (create probe table, insert probe, select matches, drop probe table)
+    #  Probes live in a TEMP table so nothing is written to the shared fine grain file
+    if packetType == SolverCode.BGK:
+        rtreeColumns = getGNDRTreeColumns(packetType)
+        inputColumns = getGNDInputColumns(packetType)
+        createString = "CREATE TEMP TABLE IF NOT EXISTS BGKGNDPROBES(ID INTEGER PRIMARY KEY, "
+        createString += ", ".join(["LOW_" + col + " REAL, HIGH_" + col + " REAL" for col in rtreeColumns]) + ", "
+        createString += ", ".join([col + " REAL" for col in inputColumns]) + ");"
+        insString = "INSERT INTO BGKGNDPROBES VALUES(" + ", ".join(["?"] * (1 + 2 * len(rtreeColumns) + len(inputColumns))) + ");"
+        # R*Tree box first, then the exact relative error check, for every probe at once
+        #  ?1 is the relative error and ?2 the ground truth version
+        selString = "SELECT P.ID, G.* FROM BGKGNDPROBES AS P CROSS JOIN BGKGND_RTREE AS R CROSS JOIN BGKGND AS G ON G.ROWID=R.ID WHERE "
+        for col in rtreeColumns:
+            selString += "R.MAX_" + col + " >= P.LOW_" + col + " AND R.MIN_" + col + " <= P.HIGH_" + col + " AND "
         #TODO: Probably verify temperature is not 0 but temperature probably won't be
-        selString += "ABS(? - TEMPERATURE) / TEMPERATURE < ?"
-        selTup += (fgsArgs.Temperature, relError)
-        selString += " AND "
-        #Density
-        for i in range(0, 4):
-            if(fgsArgs.Density[i] != 0.0):
-                selString += "ABS(? - DENSITY_" + str(i) + ") / DENSITY_" + str(i) + " < ?"
-                selTup += (fgsArgs.Density[i], relError)
-                selString += " AND "
-        #Charges
-        for i in range(0, 4):
-            if(fgsArgs.Charges[i] != 0.0):
-                selString += "ABS(? - CHARGES_" + str(i) + ") / CHARGES_" + str(i) + " < ?"
-                selTup += (fgsArgs.Charges[i], relError)
-                selString += " AND "
-        #Version
-        selString += "INVERSION=?;"
-        selTup += (getGroundishTruthVersion(SolverCode.BGK),)
+        selString += "ABS(P.TEMPERATURE - G.TEMPERATURE) / G.TEMPERATURE < ?1 AND "
+        # Zero inputs are not matched on
+        for col in inputColumns[1:]:
+            selString += "(P." + col + " = 0.0 OR ABS(P." + col + " - G." + col + ") / G." + col + " < ?1) AND "
+        selString += "G.INVERSION=?2 ORDER BY P.ID, G.ROWID;"
+        dropString = "DROP TABLE IF EXISTS BGKGNDPROBES;"
+        return (createString, insString, selString, dropString)
     else:
         raise Exception('Using Unsupported Solver Code')
-    return (selString, selTup)
+
+def getGNDProbeTuple(probeID, fgsArgs, relError):
+    if isinstance(fgsArgs, BGKInputs):
+        inputValues = dict(zip(getGNDInputColumns(SolverCode.BGK), [fgsArgs.Temperature] + list(fgsArgs.Density) + list(fgsArgs.Charges)))
+        probeTup = (probeID,)
+        for col in getGNDRTreeColumns(SolverCode.BGK):
+            value = inputValues[col]
+            if value == 0.0:
+                # Not matched on, so the box is unbounded along this axis
+                probeTup += (-np.inf, np.inf)
+            else:
+                (lowBound, highBound) = getRelErrorBounds(value, relError)
+                probeTup += (lowBound, np.inf if highBound is None else highBound)
+        probeTup += tuple(inputValues.values())
+        return probeTup
+    else:
+        raise Exception('Using Unsupported Solver Code')
+
+def lookupGNDBatch(inputList, configStruct, fgDB):
+    # Resolves every input against ground truth with one insert and one query
+    #   Returns (np bool array of hits, list of outputs with None for misses)
+    isHit = np.zeros(len(inputList), dtype=bool)
+    outputs = [None] * len(inputList)
+    if len(inputList) == 0:
+        return (isHit, outputs)
+    packetType = configStruct['solverCode']
+    relError = configStruct['ICFParameters']['RelativeError']
+    (createString, insString, selString, dropString) = getGNDBatchStrings(packetType)
+    fgDB.openCursor()
+    fgDB.execute(createString)
+    fgDB.executemany(insString, [getGNDProbeTuple(i, fgsArgs, relError) for (i, fgsArgs) in enumerate(inputList)])
+    for row in fgDB.execute(selString, (relError, getGroundishTruthVersion(packetType))):
+        # Later rows win, as with one query per input
+        i = row[0]
+        isHit[i] = True
+        outputs[i] = BGKOutputs(Viscosity=row[11], ThermalConductivity=row[12], DiffCoeff=row[13:23])
+    fgDB.execute(dropString)
+    fgDB.commit()
+    fgDB.closeCursor()
+    return (isHit, outputs)
 
 def processReqRow(sqlRow, packetType):
     if packetType == SolverCode.BGK:
@@ -173,96 +229,155 @@ def writeBGKLammpsInputs(fgsArgs, dirPath, glueMode):
     else:
         raise Exception('Using Unsupported Solver Code')
 
-def checkSlurmQueue(uname):
+def launchJobScript(binary, script, wantReturn, extraArgs=[]):
+    # Returns None if the launch failed
     try:
         runproc = subprocess.run(
-            ["squeue", "-u", uname],
-            stdout=subprocess.PIPE,
+            [binary] + extraArgs + [script],
+            stdout=subprocess.PIPE, 
             stderr=subprocess.PIPE
         )
         if runproc.returncode == 0:
-            return str(runproc.stdout,"utf-8")
+            if(wantReturn):
+                return str(runproc.stdout,"utf-8")
+            else:
+                return ""
         else:
             print(str(runproc.stderr,"utf-8"), file=sys.stderr)
-            return ""
+            return None
     except FileNotFoundError as err:
         print(err, file=sys.stderr)
-        return ""
+        return None
 
-def checkFluxQueue():
+def checkSlurmJobs(jobIDs):
+    # Machine readable: no header, one job ID (or array task ID) per line
+    #  Array tasks are ${ARRAYJOBID}_${TASKID} so query their parent jobs
+    parentIDs = sorted(set(jobID.split("_")[0] for jobID in jobIDs))
     try:
         runproc = subprocess.run(
-            ["flux", "jobs"],
+            ["squeue", "-h", "-r", "-o", "%i", "-j", ",".join(parentIDs)],
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE
         )
         if runproc.returncode == 0:
             return str(runproc.stdout,"utf-8")
         else:
-            print(str(runproc.stderr,"utf-8"), file=sys.stderr)
-            return ""
+            errString = str(runproc.stderr,"utf-8")
+            # Some versions of squeue error out once none of the jobs are left
+            if "Invalid job id" in errString:
+                return ""
+            print(errString, file=sys.stderr)
+            return None
     except FileNotFoundError as err:
         print(err, file=sys.stderr)
-        return ""
+        return None
 
-def launchJobScript(binary, script, wantReturn, extraArgs=[]):
+def checkFluxJobs(jobIDs):
+    # Machine readable: no header, one job ID and state per line
     try:
         runproc = subprocess.run(
-            [binary] + extraArgs + [script],
-            stdout=subprocess.PIPE, 
+            ["flux", "jobs", "-n", "-o", "{id} {state}"] + list(jobIDs),
+            stdout=subprocess.PIPE,
             stderr=subprocess.PIPE
         )
         if runproc.returncode == 0:
-            if(wantReturn):
-                return str(runproc.stdout,"utf-8")
-            else:
-                return ""
+            return str(runproc.stdout,"utf-8")
         else:
             print(str(runproc.stderr,"utf-8"), file=sys.stderr)
-            return ""
+            return None
     except FileNotFoundError as err:
         print(err, file=sys.stderr)
-        return ""
+        return None
 
-def getQueueUsability(uname, configStruct):
+def getActiveJobs(jobIDs, configStruct):
+    # Returns the subset of jobIDs still pending or running, or None if the scheduler could not tell us
+    if len(jobIDs) == 0:
+        return set()
     if configStruct['SchedulerInterface'] == SchedulerInterface.SLURM:
-        queueState = getSlurmQueue(uname)
-        maxJobs = configStruct['SlurmScheduler']['MaxSlurmJobs']
-        if queueState[0] < maxJobs:
-            return True
-        else:
-            return False
+        slurmOut = checkSlurmJobs(jobIDs)
+        if slurmOut is None:
+            return None
+        return set(line.strip() for line in slurmOut.splitlines()) & set(jobIDs)
     elif configStruct['SchedulerInterface'] == SchedulerInterface.BLOCKING:
-        return True
+        return set()
     elif configStruct['SchedulerInterface'] == SchedulerInterface.FLUX:
-        queueState = getFluxQueue()
-        maxJobs = configStruct['FluxScheduler']['ConcurrentJobs']
-        if queueState[0] < maxJobs:
-            return True
+        fluxOut = checkFluxJobs(jobIDs)
+        if fluxOut is None:
+            return None
+        activeJobs = set()
+        for line in fluxOut.splitlines():
+            fields = line.split()
+            if len(fields) == 2 and fields[1] != "INACTIVE":
+                activeJobs.add(fields[0])
+        return activeJobs & set(jobIDs)
+    else:
+        raise Exception('Using Unsupported Scheduler Mode')
+
+def checkJobRunTimes(argList):
+    # Machine readable: no header, one job ID and seconds spent running per line
+    try:
+        runproc = subprocess.run(
+            argList,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        if runproc.returncode == 0:
+            return str(runproc.stdout,"utf-8")
         else:
-            return False
+            print(str(runproc.stderr,"utf-8"), file=sys.stderr)
+            return None
+    except FileNotFoundError as err:
+        print(err, file=sys.stderr)
+        return None
+
+def getJobRunTimes(jobIDs, configStruct):
+    # Returns a map of job ID to seconds it has spent running, not counting time waiting in the queue
+    #  Jobs the scheduler could not tell us about are left out
+    if len(jobIDs) == 0:
+        return {}
+    if configStruct['SchedulerInterface'] == SchedulerInterface.SLURM:
+        # -X skips job steps so array tasks show up as ${ARRAYJOBID}_${TASKID}
+        runOut = checkJobRunTimes(["sacct", "-n", "-P", "-X", "-o", "JobID,ElapsedRaw", "-j", ",".join(jobIDs)])
+        separator = "|"
+    elif configStruct['SchedulerInterface'] == SchedulerInterface.FLUX:
+        runOut = checkJobRunTimes(["flux", "jobs", "-a", "-n", "-o", "{id} {runtime}"] + list(jobIDs))
+        separator = None
     else:
         raise Exception('Using Unsupported Scheduler Mode')
+    if runOut is None:
+        return {}
+    runTimes = {}
+    for line in runOut.splitlines():
+        fields = line.split(separator)
+        if len(fields) != 2 or fields[0].strip() not in jobIDs:
+            continue
+        try:
+            runTimes[fields[0].strip()] = float(fields[1])
+        except ValueError:
+            continue
+    return runTimes
 
-def getSlurmQueue(uname):
-    slurmOut = checkSlurmQueue(uname)
-    if slurmOut == "":
-        return (sys.maxsize, [])
-    strList = slurmOut.splitlines()
-    if len(strList) > 1:
-        return (len(strList) - 1, strList[1:])
+def getMaxConcurrentJobs(configStruct):
+    if configStruct['SchedulerInterface'] == SchedulerInterface.SLURM:
+        return configStruct['SlurmScheduler']['MaxSlurmJobs']
+    elif configStruct['SchedulerInterface'] == SchedulerInterface.BLOCKING:
+        return getSchedulerSettings(configStruct).get('ConcurrentJobs', 1)
+    elif configStruct['SchedulerInterface'] == SchedulerInterface.FLUX:
+        return configStruct['FluxScheduler']['ConcurrentJobs']
     else:
-        return (0, [])
+        raise Exception('Using Unsupported Scheduler Mode')
 
-def getFluxQueue():
-    fluxOut = checkFluxQueue()
-    if fluxOut == "":
-        return (sys.maxsize, [])
-    strList = fluxOut.splitlines()
-    if len(strList) > 1:
-        return (len(strList) - 1, strList[1:])
+def getSchedulerSettings(configStruct):
+    if configStruct['SchedulerInterface'] == SchedulerInterface.SLURM:
+        return configStruct['SlurmScheduler']
+    elif configStruct['SchedulerInterface'] == SchedulerInterface.BLOCKING:
+        if 'BlockingScheduler' in configStruct:
+            return configStruct['BlockingScheduler']
+        return {}
+    elif configStruct['SchedulerInterface'] == SchedulerInterface.FLUX:
+        return configStruct['FluxScheduler']
     else:
-        return (0, [])
+        raise Exception('Using Unsupported Scheduler Mode')
 
 # TODO: Make sure this is all from the fine grain table, not coarse grain, because wow
 def getAllGNDData(dbHandle, solverCode):
@@ -366,11 +481,20 @@ def lammpsProvisioningBoilerplate(jobFile, configStruct):
     else:
         raise Exception('Using Unsupported Provisioning Mode')
 
-def launchFGSJob(jobFile, configStruct):
+def launchFGSJob(jobFile, configStruct, processRunner=None, onFinish=None):
+    # Returns the scheduler job ID, "" if there is nothing to track, or None if submission failed
+    #  Blocking jobs run in the background on processRunner if given, calling onFinish when done
     if configStruct['SchedulerInterface'] == SchedulerInterface.SLURM:
-        launchJobScript("sbatch", jobFile, True)
+        # --parsable prints just "jobid" or "jobid;cluster"
+        launchOut = launchJobScript("sbatch", jobFile, True, extraArgs=["--parsable"])
+        if launchOut is None:
+            return None
+        return launchOut.strip().split(";")[0]
     elif configStruct['SchedulerInterface'] == SchedulerInterface.BLOCKING:
-        launchJobScript("bash", jobFile, False)
+        if processRunner is not None:
+            return processRunner.submit(["bash", jobFile], onFinish)
+        # Job has already finished by the time this returns
+        return launchJobScript("bash", jobFile, False)
     elif configStruct['SchedulerInterface'] == SchedulerInterface.FLUX:
         argList = ["mini", "batch"]
         argList += ["-n"]
@@ -379,19 +503,29 @@ def launchFGSJob(jobFile, configStruct):
         argList += [str(configStruct['FluxScheduler']['CoresPerSlotForFlux'])]
         argList += ["-N"]
         argList += [str(configStruct['FluxScheduler']['NodesPerJobForFlux'])]
-        launchJobScript("flux", jobFile, True, extraArgs=argList)
+        launchOut = launchJobScript("flux", jobFile, True, extraArgs=argList)
+        if launchOut is None:
+            return None
+        # flux mini batch prints the job ID
+        return launchOut.strip()
     else:
         raise Exception('Using Unsupported Scheduler Mode')
 
-def buildAndLaunchFGSJob(configStruct, rank, uname, reqid, fgsArgs, glueMode):
+def getFGSJobPath(configStruct, rank, reqid):
+    # ./${TAG}_${RANK}_${REQ}
+    return os.path.join(os.getcwd(), configStruct['tag'] + "_" + str(rank) + "_" + str(reqid))
+
+def buildFGSJob(configStruct, rank, uname, reqid, fgsArgs, glueMode):
+    # Returns path to the job script, or None if this request was already built
+    scriptFPath = None
     solverCode = configStruct['solverCode']
     tag = configStruct['tag']
     # Fine grain so want to use the slower shared DB
     dbPath = configStruct['DatabaseSettings']['FineGrainDB']['DatabaseURL']
     if solverCode == SolverCode.BGK or solverCode == SolverCode.BGKMASSES:
         # Mkdir ./${TAG}_${RANK}_${REQ}
-        outDir = tag + "_" + str(rank) + "_" + str(reqid)
-        outPath = os.path.join(os.getcwd(), outDir)
+        outPath = getFGSJobPath(configStruct, rank, reqid)
+        outDir = os.path.basename(outPath)
         if(not os.path.exists(outPath)):
             os.mkdir(outPath)
             # cp ${SCRIPT_DIR}/lammpsScripts/${lammpsScript}
@@ -442,11 +576,60 @@ def buildAndLaunchFGSJob(configStruct, rank, uname, reqid, fgsArgs, glueMode):
             #Chmod+x that script
             st = os.stat(scriptFPath)
             os.chmod(scriptFPath, st.st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
-            # either syscall or subprocess.run slurm with the script
-            launchFGSJob(scriptFPath, configStruct)
-            # Then do nothing because the script itself will write the result
     else:
         raise Exception('Using Unsupported Solver Code')
+    return scriptFPath
+
+def launchFGSJobArray(scriptFPaths, configStruct):
+    # Submits already built job scripts as one Slurm job array or Flux bundle
+    #  Returns a job ID per script in order, or None if submission failed
+    tag = configStruct['tag']
+    # Name the bundle after its first request so it is unique
+    firstDir = os.path.basename(os.path.dirname(scriptFPaths[0]))
+    outDir = firstDir.replace(tag + "_", tag + "_array_", 1)
+    outPath = os.path.join(os.getcwd(), outDir)
+    os.makedirs(outPath, exist_ok=True)
+    # Task i runs the script on line i+1 of the manifest
+    manifestFPath = os.path.join(outPath, "manifest.txt")
+    with open(manifestFPath, 'w') as manifestFile:
+        for scriptFPath in scriptFPaths:
+            manifestFile.write(scriptFPath + "\n")
+    arrayFPath = os.path.join(outPath, outDir + ".sh")
+    with open(arrayFPath, 'w') as arrayFile:
+        jobScriptBoilerplate(arrayFile, outDir, configStruct)
+        arrayFile.write("TASK_INDEX=${SLURM_ARRAY_TASK_ID:-${FLUX_JOB_CC}}\n")
+        arrayFile.write("JOB_SCRIPT=`sed -n \"$((TASK_INDEX + 1))p\" " + manifestFPath + "`\n")
+        arrayFile.write("bash ${JOB_SCRIPT}\n")
+    st = os.stat(arrayFPath)
+    os.chmod(arrayFPath, st.st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    taskRange = "0-" + str(len(scriptFPaths) - 1)
+    if configStruct['SchedulerInterface'] == SchedulerInterface.SLURM:
+        launchOut = launchJobScript("sbatch", arrayFPath, True, extraArgs=["--parsable", "--array=" + taskRange])
+        if launchOut is None:
+            return None
+        arrayJobID = launchOut.strip().split(";")[0]
+        # squeue -r reports array tasks as ${ARRAYJOBID}_${TASKID}
+        return [arrayJobID + "_" + str(i) for i in range(len(scriptFPaths))]
+    elif configStruct['SchedulerInterface'] == SchedulerInterface.FLUX:
+        argList = ["mini", "batch"]
+        argList += ["--cc=" + taskRange]
+        argList += ["-n"]
+        argList += [str(configStruct['FluxScheduler']['SlotsPerJobForFlux'])]
+        argList += ["-c"]
+        argList += [str(configStruct['FluxScheduler']['CoresPerSlotForFlux'])]
+        argList += ["-N"]
+        argList += [str(configStruct['FluxScheduler']['NodesPerJobForFlux'])]
+        launchOut = launchJobScript("flux", arrayFPath, True, extraArgs=argList)
+        if launchOut is None:
+            return None
+        # One job ID per copy, in copy order
+        jobIDs = launchOut.split()
+        if len(jobIDs) != len(scriptFPaths):
+            print("Expected " + str(len(scriptFPaths)) + " flux job IDs but got " + str(len(jobIDs)), file=sys.stderr)
+            return None
+        return jobIDs
+    else:
+        raise Exception('Using Unsupported Scheduler Mode For Job Arrays')
 
 def alModelStub(inArgs):
     if isinstance(inArgs, BGKInputs):
@@ -461,27 +644,22 @@ def uqCheckerStub(err):
     else:
         return False
 
-def getInterpModel(packetType, alBackend, dbHandle):
-    #TODO Use packetType
+def wrapLearnerModel(alBackend, learnerModel):
+    # Wraps a learner model trained by BackgroundTrainer for the glue loop
     if alBackend == LearnerBackend.FAKE:
         return InterpModelWrapper(alModelStub, uqCheckerStub)
     if alBackend == LearnerBackend.PYTORCH:
-        import nn_learner
-        return BGKPytorchInterpModel(nn_learner.retrain(dbHandle))
+        return BGKPytorchInterpModel(learnerModel)
     if alBackend == LearnerBackend.RANDFOREST:
-        import rf_learner
-        return BGKRandForestInterpModel(rf_learner.retrain(dbHandle)) 
+        return BGKRandForestInterpModel(learnerModel)
     else:
-        raise Exception('Using Unsupported Active Learning Backewnd')
+        raise Exception('Using Unsupported Active Learning Backend')
 
-def insertALPrediction(inFGS, outFGS, solverCode, sqlDB):
+def getALPredictionSQLStringAndTuple(inFGS, outFGS, solverCode):
     if solverCode == SolverCode.BGK:
-        sqlDB.openCursor()
         insString = "INSERT INTO BGKALLOGS VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);"
         insArgs = (inFGS.Temperature,) + tuple(inFGS.Density) + tuple(inFGS.Charges) + (getGroundishTruthVersion(solverCode),) + (outFGS.Viscosity, outFGS.ThermalConductivity) + tuple(outFGS.DiffCoeff) + (getGroundishTruthVersion(solverCode),)
-        sqlDB.execute(insString, insArgs)
-        sqlDB.commit()
-        sqlDB.closeCursor()
+        return (insString, insArgs)
     else:
         raise Exception("Using Unsupported Solver Code")
 
@@ -504,6 +682,21 @@ class InterpModelWrapper:
         (err, output) = self.model(inputStruct)
         isLegit = self.uq(err)
         return (isLegit, output)
+    def batch(self, inputStructs):
+        # Returns (isLegit array, list of outputs) for a list of inputs
+        results = [self(inputStruct) for inputStruct in inputStructs]
+        isLegit = np.array([result[0] for result in results], dtype=bool)
+        outputs = [result[1] for result in results]
+        return (isLegit, outputs)
+
+def batchedEnsembleCall(model, inputStructs):
+    # One model.process call on an (N, n_inputs) array instead of N single row calls
+    packedInputs = np.stack([model.pack_inputs(inputStruct) for inputStruct in inputStructs])
+    (means, errbars) = model.process(packedInputs, perform_column_extraction=False)
+    # Same as simpleALErrorChecker on each unpacked row, just vectorized
+    isLegit = np.all(model.process_iserrok(errbars), axis=1)
+    outputs = [model.unpack_outputs(mean) for mean in means]
+    return (isLegit, outputs)
 
 class BGKPytorchInterpModel(InterpModelWrapper):
     def __init__(self, newModel):
@@ -514,6 +707,8 @@ class BGKPytorchInterpModel(InterpModelWrapper):
         modErr = self.model.iserrok(err)
         isLegit = simpleALErrorChecker(modErr)
         return (isLegit, output)
+    def batch(self, inputStructs):
+        return batchedEnsembleCall(self.model, inputStructs)
 
 class BGKRandForestInterpModel(InterpModelWrapper):
         def __init__(self, newModel):
@@ -524,52 +719,73 @@ class BGKRandForestInterpModel(InterpModelWrapper):
             modErr = self.model.iserrok(err)
             isLegit = simpleALErrorChecker(modErr)
             return (isLegit, output)
+        def batch(self, inputStructs):
+            return batchedEnsembleCall(self.model, inputStructs)
 
-def insertResultSlow(rank, tag, reqid, fgsResult, resultProvenance, sqlDB):
+def getResultSQLStringAndTuple(rank, tag, reqid, fgsResult, resultProvenance, tableName):
     if isinstance(fgsResult, BGKOutputs):
-        sqlDB.openCursor()
-        insString = "INSERT INTO BGKRESULTS VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        insString = "INSERT INTO " + tableName + " VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
         insArgs = (tag, rank, reqid, fgsResult.Viscosity, fgsResult.ThermalConductivity) + tuple(fgsResult.DiffCoeff) + (resultProvenance,)
-        sqlDB.execute(insString, insArgs)
-        sqlDB.commit()
-        sqlDB.closeCursor()
+        return (insString, insArgs)
     else:
         raise Exception('Using Unsupported Solver Code')
 
-def insertResult(rank, tag, reqid, fgsResult, resultProvenance, sqlDB):
-    if isinstance(fgsResult, BGKOutputs):
-        sqlDB.openCursor()
-        insString = "INSERT INTO BGKFASTRESULTS VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
-        insArgs = (tag, rank, reqid, fgsResult.Viscosity, fgsResult.ThermalConductivity) + tuple(fgsResult.DiffCoeff) + (resultProvenance,)
-        sqlDB.execute(insString, insArgs)
-        sqlDB.commit()
-        sqlDB.closeCursor()
-    else:
-        raise Exception('Using Unsupported Solver Code')
+def insertResultSlow(rank, tag, reqid, fgsResult, resultProvenance, sqlDB):
+    (insString, insArgs) = getResultSQLStringAndTuple(rank, tag, reqid, fgsResult, resultProvenance, "BGKRESULTS")
+    sqlDB.openCursor()
+    sqlDB.execute(insString, insArgs)
+    sqlDB.commit()
+    sqlDB.closeCursor()
 
-#TODO: Figure out correct location for this
-def icfComparator(lhs, rhs, epsilon):
-    retVal = True
-    if rhs.Temperature != 0.0 and (lhs.Temperature - rhs.Temperature) / rhs.Temperature > epsilon:
-        retVal = False
-    for i in range(4):
-        if rhs.Density[i] != 0.0 and (lhs.Density[i] - rhs.Density[i]) / rhs.Density[i] > epsilon:
-            return False
-        if rhs.Charges[i] != 0.0 and (lhs.Charges[i] - rhs.Charges[i]) / rhs.Charges[i] > epsilon:
-            return False
-    return retVal
+class ResultWriter:
+    """Write-behind buffer for results and learner predictions
 
-def cacheCheck(inArgs, configStruct, dbCache):
-    if isinstance(inArgs, BGKInputs):
-        #TODO: Make this cleaner
-        epsilon = configStruct['ICFParameters']['RelativeError']
-        for entry in dbCache:
-            if icfComparator(inArgs, entry[0], epsilon):
-                return entry[1]
-        return None
-    else:
-        return None
+    Collects rows for the coarse grain DB and writes them with one
+    executemany per table in a single transaction, then merges the
+    buffer table once per flush"""
+    def __init__(self, cgDB, solverCode, batchConfig={}):
+        self.cgDB = cgDB
+        self.solverCode = solverCode
+        # Flush early once this many rows are pending
+        self.maxBatchSize = batchConfig.get("MaxBatchSize", 10000)
+        # Flush early once the oldest pending row has waited this many seconds
+        self.maxBatchLatency = batchConfig.get("MaxBatchLatency", 1.0)
+        # Map of insert string to list of argument tuples
+        self.pending = {}
+        self.numPending = 0
+        self.oldestPending = None
+    def insertResult(self, rank, tag, reqid, fgsResult, resultProvenance):
+        self.addRow(getResultSQLStringAndTuple(rank, tag, reqid, fgsResult, resultProvenance, "BGKFASTRESULTS"))
+    def insertALPrediction(self, inFGS, outFGS):
+        self.addRow(getALPredictionSQLStringAndTuple(inFGS, outFGS, self.solverCode))
+    def addRow(self, insStringAndTuple):
+        (insString, insArgs) = insStringAndTuple
+        self.pending.setdefault(insString, []).append(insArgs)
+        if self.numPending == 0:
+            self.oldestPending = time.perf_counter()
+        self.numPending += 1
+        self.checkFlush()
+    def checkFlush(self):
+        # Flush if either threshold has been hit
+        if self.numPending == 0:
+            return
+        if self.numPending >= self.maxBatchSize or time.perf_counter() - self.oldestPending >= self.maxBatchLatency:
+            self.flush()
+    def flush(self):
+        if self.numPending == 0:
+            return
+        self.cgDB.openCursor()
+        for insString, insArgsList in self.pending.items():
+            self.cgDB.executemany(insString, insArgsList)
+        self.cgDB.commit()
+        self.cgDB.closeCursor()
+        self.pending = {}
+        self.numPending = 0
+        self.oldestPending = None
+        # Copy the fast local results to the right table of the shared db
+        mergeBufferTable(self.solverCode, self.cgDB)
 
+#TODO: Figure out correct location for this
 def mergeBufferTable(solverCode, cgDB):
     if solverCode == SolverCode.BGK:
         cgDB.openCursor()
@@ -582,123 +798,441 @@ def mergeBufferTable(solverCode, cgDB):
     else:
         raise Exception('Using Unsupported Solver Code')
 
+def getResultSyncSQLStrings(packetType):
+    # Returns (select newer fine grain rows, insert unless (TAG, RANK, REQ) already present)
+    if packetType == SolverCode.BGK:
+        selString = "SELECT ROWID, * FROM BGKRESULTS WHERE ROWID>?;"
+        insString = "INSERT INTO BGKRESULTS SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ? "
+        insString += "WHERE NOT EXISTS(SELECT 1 FROM BGKRESULTS WHERE TAG=? AND RANK=? AND REQ=?);"
+        return (selString, insString)
+    else:
+        raise Exception('Using Unsupported Solver Code')
+
 #TODO: We do not actually pull GND. Just Results. Check if that is okay. It probably isn't
-def pullGlobalResultsToFastDBPython(solverCode, cgDB, fgDB):
+def pullGlobalResultsToFastDBPython(solverCode, cgDB, fgDB, watermark):
     # Manually copy data in by opening the DB, reading it, and then writing results
+    #  Only rows past the watermark (highest fine grain ROWID already synced) are read
+    #  and rows whose (TAG, RANK, REQ) already exist are skipped, so repeat syncs are no-ops
     if solverCode == SolverCode.BGK:
+        (selString, insString) = getResultSyncSQLStrings(solverCode)
         # Open Fine Grain DB
         fgDB.openCursor()
         # Copy out results
-        resultList = []
-        # TODO: Add logic to reduce number of reads later...
-        #   Might be able to do an SQL query to find the gap
-        resQuery = "SELECT * FROM BGKRESULTS;"
-        for row in fgDB.execute(resQuery):
-            # Basically just copy the result verbatim into list
-            resultList.append(row)
+        insArgsList = []
+        nuWatermark = watermark
+        for row in fgDB.execute(selString, (watermark,)):
+            if row[0] > nuWatermark:
+                nuWatermark = row[0]
+            # Strip ROWID and add the key to check for duplicates against
+            result = tuple(row[1:])
+            insArgsList.append(result + result[0:3])
         # Close FGDB
         fgDB.closeCursor()
-        # Write results to fastDB (CGDB)
-        if len(resultList) > 0:
+        # Write results to fastDB (CGDB) as one transaction
+        if len(insArgsList) > 0:
             cgDB.openCursor()
-            # TODO: Update to do bulk insertions once this works
-            for result in resultList:
-                insString = "INSERT INTO BGKRESULTS (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?);"
-                cgDB.execute(insString, tuple(result))
+            cgDB.executemany(insString, insArgsList)
             cgDB.commit()
             cgDB.closeCursor()
+        return nuWatermark
     else:
         raise Exception('pullGlobalResultsToFastDBPython: Using Unsupported Solver Code')
 
-def pullGlobalResultsToFastDBAttach(solverCode, cgDB, fgDB):
-    raise Exception('pullGlobalResultsToFastDBAttach: Currently Unsupported')
-    # Might need to add to fine grain db path  because of different dirs?
-    #TODO: Probably do two approaches
-    #  1. If both DB types are the same, attach?
-    #  2. if DB types differ... we take a memory hit?
+def pullGlobalResultsToFastDBAttach(solverCode, cgDB, fgDB, watermark):
+    # Both DBs are SQLite so let SQLite copy the rows without going through python
+    #TODO: GND is still not pulled, see pullGlobalResultsToFastDBPython
     dbAlias = "DBFG"
     if solverCode == SolverCode.BGK:
-        #TODO: Probably go through all of this because we mixed up fast and fine grain a few times
-        #TODO: Also may need to still handle this special as we are re-opening a DB
-        #TODO: Maybe add another command to the class?
-        #WARNING WARNING WARNING: THis is gonna be an issue with different DB types...
-
-        # Probably still have fastDB open?
-        sqlCursor = fastDB.cursor()
+        cgDB.openCursor()
         # Want to ATTACH globalDB to existing connection
-        sqlAttachStr = "ATTACH DATABASE \'" + fgDBPath
-        sqlAttachStr += "\' AS " + dbAlias + ";"
-        sqlCursor.execute(sqlAttachStr)
-        # Now copy out the results
-        sqlResultsStr = "INSERT INTO BGKRESULTS SELECT * FROM "
-        sqlResultsStr += dbAlias + ".BGKRESULTS WHERE NOT EXISTS("
-        sqlResultsStr += "SELECT * FROM BGKRESULTS WHERE("
-        sqlResultsStr += getEquivalenceSQLStringsResults(solverCode, dbAlias)
-        sqlResultsStr += "));"
-        sqlCursor.execute(sqlResultsStr)
-        # And the GNDish truth
-        sqlGNDStr = "INSERT INTO BGKGND SELECT * FROM "
-        sqlGNDStr += dbAlias + ".BGKGND WHERE NOT EXISTS("
-        sqlGNDStr += "SELECT * FROM BGKGND WHERE("
-        sqlGNDStr += getEquivalenceSQLStringsGND(solverCode, dbAlias)
-        sqlGNDStr += "));"
-        sqlCursor.execute(sqlGNDStr)
-        fastDB.commit()
-        # And detach the DB
-        sqlDetachStr = "DETACH DATABASE ?;"
-        sqlDetachTup = (dbAlias,)
-        sqlCursor.execute(sqlDetachStr, sqlDetachTup)
-        # Commit commands and close cursor
-        fastDB.commit()
-        sqlCursor.close()
+        cgDB.execute("ATTACH DATABASE ? AS " + dbAlias + ";", (fgDB.dbURL,))
+        # Find the new watermark first so rows landing mid-copy wait for the next sync
+        nuWatermark = watermark
+        for row in cgDB.execute("SELECT MAX(ROWID) FROM " + dbAlias + ".BGKRESULTS;"):
+            if row[0] is not None:
+                nuWatermark = row[0]
+        if nuWatermark > watermark:
+            # Now copy out the results
+            sqlResultsStr = "INSERT INTO BGKRESULTS SELECT * FROM "
+            sqlResultsStr += dbAlias + ".BGKRESULTS WHERE "
+            sqlResultsStr += dbAlias + ".BGKRESULTS.ROWID>? AND "
+            sqlResultsStr += dbAlias + ".BGKRESULTS.ROWID<=? AND NOT EXISTS("
+            sqlResultsStr += "SELECT * FROM BGKRESULTS WHERE("
+            sqlResultsStr += getEquivalenceSQLStringsResults(solverCode, dbAlias)
+            sqlResultsStr += "));"
+            cgDB.execute(sqlResultsStr, (watermark, nuWatermark))
+        # Commit before detaching as DETACH is not allowed mid transaction
+        cgDB.commit()
+        cgDB.execute("DETACH DATABASE " + dbAlias + ";")
+        cgDB.closeCursor()
+        return nuWatermark
     else:
         raise Exception('pullGlobalResultsToFastDBAttach: Using Unsupported Solver Code')
 
-def queueFGSJob(configStruct, uname, reqID, inArgs, rank, modeSwitch, cgDB, fgDB, dbCache):
+def pullGlobalResultsToFastDB(solverCode, cgDB, fgDB, watermark):
+    # Returns the new watermark to pass to the next sync
+    if isinstance(cgDB, SQLiteHandle) and isinstance(fgDB, SQLiteHandle):
+        return pullGlobalResultsToFastDBAttach(solverCode, cgDB, fgDB, watermark)
+    else:
+        return pullGlobalResultsToFastDBPython(solverCode, cgDB, fgDB, watermark)
+
+class FGSJobQueue:
+    """Pending fine grain jobs waiting on scheduler capacity
+
+    Jobs launch immediately when the scheduler has room and otherwise wait
+    here until a later drain, so the glue loop never blocks on a full
+    cluster. Only jobs this queue submitted count against the concurrency
+    limit. Their state is refreshed every QueueStateTTL seconds and the
+    count is bumped locally for each launch in between refreshes. With a
+    JobArraySize above one, pending requests are bundled into job arrays
+    when the queue is drained. Blocking scheduler jobs run in the
+    background, up to BlockingScheduler ConcurrentJobs at a time"""
+    def __init__(self, configStruct, uname):
+        self.configStruct = configStruct
+        self.uname = uname
+        schedulerSettings = getSchedulerSettings(configStruct)
+        self.queueStateTTL = schedulerSettings.get('QueueStateTTL', 10.0)
+        # Submit up to this many requests as one job array
+        self.jobArraySize = 1
+        if configStruct['SchedulerInterface'] != SchedulerInterface.BLOCKING:
+            self.jobArraySize = schedulerSettings.get('JobArraySize', 1)
+        self.maxJobs = getMaxConcurrentJobs(configStruct)
+        # Set whenever a background job finishes so the glue loop can wake up and ingest results
+        self.jobFinished = threading.Event()
+        self.processRunner = None
+        if configStruct['SchedulerInterface'] == SchedulerInterface.BLOCKING:
+            self.processRunner = AsyncProcessRunner(self.maxJobs)
+            # Job state is in memory so there is nothing to cache
+            self.queueStateTTL = 0.0
+        # Format is (rank, reqID, inputTuple, glueMode)
+        self.pending = collections.deque()
+        # Map of (rank, reqID) to scheduler job ID for jobs not known to be finished
+        self.jobIDs = {}
+        # Map of (rank, reqID) to scheduler job ID, or None until launched, for jobs whose run time is asked for later
+        self.watched = {}
+        # Resubmit a rejected job this many times before giving up on it
+        self.submitRetries = schedulerSettings.get('SubmitRetries', 2)
+        # Map of (rank, reqID) to how many times the scheduler has rejected it
+        self.rejections = {}
+        # Entries the scheduler kept rejecting, waiting for takeFailed
+        self.failed = []
+        # Entries skipped because an earlier run already built their job, waiting for takeAlreadyBuilt
+        self.alreadyBuilt = []
+        self.numJobs = 0
+        self.lastRefresh = None
+    def __len__(self):
+        return len(self.pending)
+    def onJobFinished(self, procID, procResult):
+        self.jobFinished.set()
+    def refresh(self):
+        if self.processRunner is not None:
+            activeJobs = self.processRunner.getActive(list(self.jobIDs.values()))
+        else:
+            activeJobs = getActiveJobs(list(self.jobIDs.values()), self.configStruct)
+        if activeJobs is None:
+            # Scheduler did not answer so assume we are full until next refresh
+            self.numJobs = self.maxJobs
+            return
+        if self.processRunner is not None:
+            # Nobody will ask for the run time of finished jobs that are not watched
+            for (key, jobID) in self.jobIDs.items():
+                if jobID not in activeJobs and key not in self.watched:
+                    self.processRunner.takeRunTime(jobID)
+        self.jobIDs = {key: jobID for key, jobID in self.jobIDs.items() if jobID in activeJobs}
+        self.numJobs = len(self.jobIDs)
+    def getFreeSlots(self):
+        now = time.perf_counter()
+        if self.lastRefresh is None or now - self.lastRefresh >= self.queueStateTTL:
+            self.refresh()
+            self.lastRefresh = now
+        return self.maxJobs - self.numJobs
+    def submit(self, rank, reqID, inArgs, glueMode):
+        self.pending.append((rank, reqID, inArgs, glueMode))
+        # With job arrays wait for the end of loop drain so requests can be bundled
+        if self.jobArraySize <= 1:
+            self.drain()
+    def drain(self, block=False):
+        # Launch as many pending jobs as the scheduler has room for
+        #  If block, keep waiting for room until everything is launched
+        while len(self.pending) > 0:
+            freeSlots = self.getFreeSlots()
+            if freeSlots <= 0:
+                if not block:
+                    return
+                time.sleep(min(max(self.queueStateTTL, 0.01), 1.0))
+                continue
+            if self.jobArraySize > 1:
+                self.launchArray(min(freeSlots, self.jobArraySize))
+            else:
+                self.launchSingle()
+    def launchSingle(self):
+        entry = self.pending.popleft()
+        (rank, reqID, inArgs, glueMode) = entry
+        print("Processing REQ=" + str(reqID))
+        scriptFPath = buildFGSJob(self.configStruct, rank, self.uname, reqID, inArgs, glueMode)
+        if scriptFPath is None:
+            self.watched.pop((rank, reqID), None)
+            self.alreadyBuilt.append(entry)
+            return
+        jobID = launchFGSJob(scriptFPath, self.configStruct, self.processRunner, self.onJobFinished)
+        self.track([entry], [jobID])
+    def launchArray(self, maxTasks):
+        entries = []
+        scriptFPaths = []
+        while len(self.pending) > 0 and len(entries) < maxTasks:
+            entry = self.pending.popleft()
+            (rank, reqID, inArgs, glueMode) = entry
+            print("Processing REQ=" + str(reqID))
+            scriptFPath = buildFGSJob(self.configStruct, rank, self.uname, reqID, inArgs, glueMode)
+            # Already built means already launched
+            if scriptFPath is None:
+                self.watched.pop((rank, reqID), None)
+                self.alreadyBuilt.append(entry)
+            else:
+                entries.append(entry)
+                scriptFPaths.append(scriptFPath)
+        if len(entries) == 0:
+            return
+        jobIDs = launchFGSJobArray(scriptFPaths, self.configStruct)
+        if jobIDs is None:
+            jobIDs = [None] * len(entries)
+        self.track(entries, jobIDs)
+    def track(self, entries, jobIDs):
+        for (entry, jobID) in zip(entries, jobIDs):
+            key = (entry[0], entry[1])
+            if jobID is None:
+                self.reject(entry)
+            elif jobID != "":
+                self.rejections.pop(key, None)
+                self.jobIDs[key] = jobID
+                self.numJobs += 1
+                if key in self.watched:
+                    self.watched[key] = jobID
+    def reject(self, entry):
+        (rank, reqID, inArgs, glueMode) = entry
+        key = (rank, reqID)
+        numRejections = self.rejections.get(key, 0) + 1
+        # The job dir marks a request as launched, so clear it or the retry is skipped
+        shutil.rmtree(getFGSJobPath(self.configStruct, rank, reqID), ignore_errors=True)
+        if numRejections <= self.submitRetries:
+            print("Failed to submit FGS job for RANK=" + str(rank) + " REQ=" + str(reqID) + ", retrying", file=sys.stderr)
+            self.rejections[key] = numRejections
+            self.pending.append(entry)
+        else:
+            print("Failed to submit FGS job for RANK=" + str(rank) + " REQ=" + str(reqID) + " after " + str(numRejections) + " attempts, giving up", file=sys.stderr)
+            self.rejections.pop(key, None)
+            self.watched.pop(key, None)
+            self.failed.append(entry)
+    def watch(self, rank, reqID):
+        # Keeps the job ID of (rank, reqID) once launched so takeRunTimes can look it up after it finishes
+        self.watched[(rank, reqID)] = None
+    def unwatch(self, rank, reqID):
+        jobID = self.watched.pop((rank, reqID), None)
+        if jobID is not None and self.processRunner is not None:
+            self.processRunner.takeRunTime(jobID)
+    def takeRunTimes(self, keys):
+        # Returns a map of (rank, reqID) to seconds its job spent running, excluding scheduler queue wait
+        #  and stops watching them. Jobs whose run time is unknown are left out
+        jobIDs = {}
+        for key in keys:
+            jobID = self.watched.pop(key, None)
+            if jobID is not None:
+                jobIDs[key] = jobID
+        if self.processRunner is not None:
+            runTimes = {key: self.processRunner.takeRunTime(jobID) for (key, jobID) in jobIDs.items()}
+            return {key: runTime for (key, runTime) in runTimes.items() if runTime is not None}
+        jobRunTimes = getJobRunTimes(list(jobIDs.values()), self.configStruct)
+        return {key: jobRunTimes[jobID] for (key, jobID) in jobIDs.items() if jobID in jobRunTimes}
+    def takeFailed(self):
+        # Returns and forgets every (rank, reqID, inputTuple, glueMode) that could not be submitted
+        failed = self.failed
+        self.failed = []
+        return failed
+    def takeAlreadyBuilt(self):
+        # Returns and forgets every (rank, reqID, inputTuple, glueMode) skipped as already built
+        alreadyBuilt = self.alreadyBuilt
+        self.alreadyBuilt = []
+        return alreadyBuilt
+    def close(self):
+        # Waits for any background jobs to finish
+        if self.processRunner is not None:
+            self.processRunner.close()
+
+def getCoresPerFGSJob(configStruct):
+    # Returns None if the config does not say how many cores a job gets
+    if configStruct['SchedulerInterface'] == SchedulerInterface.SLURM:
+        # The glue code node says nothing about the compute nodes, so this has to come from the config
+        coresPerNode = configStruct['SlurmScheduler'].get('CoresPerNode', None)
+        if coresPerNode is None:
+            return None
+        return configStruct['SlurmScheduler']['NodesPerSlurmJob'] * coresPerNode
+    elif configStruct['SchedulerInterface'] == SchedulerInterface.BLOCKING:
+        return getSchedulerSettings(configStruct).get('MPIRanksForBlockingRuns', 1)
+    elif configStruct['SchedulerInterface'] == SchedulerInterface.FLUX:
+        return configStruct['FluxScheduler']['SlotsPerJobForFlux'] * configStruct['FluxScheduler']['CoresPerSlotForFlux']
+    else:
+        raise Exception('Using Unsupported Scheduler Mode')
+
+def getCoalescedResultSelString(packetType):
+    # Fine grain results that arrived between two syncs
+    if packetType == SolverCode.BGK:
+        return "SELECT * FROM BGKRESULTS WHERE ROWID>? AND ROWID<=?;"
+    else:
+        raise Exception('Using Unsupported Solver Code')
+
+class FGSCoalescer:
+    """In flight fine grain jobs that later requests can share
+
+    Inputs of every launched job are kept in a GNDCache per fine grain
+    mode, keyed to the (rank, reqID) that launched it. A request within
+    RelativeError of an in flight job of the same mode waits on that job
+    instead of launching its own, and the result is copied to every waiter
+    once it is synced from the fine grain DB. A leader whose job never
+    launches is dropped and its waiters handed back to the caller. Core
+    hours saved count each leader's run time as reported by the scheduler,
+    so time spent waiting in the queue is left out"""
+    def __init__(self, configStruct):
+        coalesceSettings = {}
+        if 'FGSCoalescing' in configStruct:
+            coalesceSettings = configStruct['FGSCoalescing']
+        self.solverCode = configStruct['solverCode']
+        self.tag = configStruct['tag']
+        self.maxInFlight = coalesceSettings.get('MaxInFlight', 100000)
+        self.coresPerJob = coalesceSettings.get('CoresPerJob', None)
+        if self.coresPerJob is None:
+            self.coresPerJob = getCoresPerFGSJob(configStruct)
+        # Configs without ICFParameters never look up ground truth, and like the DB a zero relError matches nothing
+        relError = 0.0
+        if 'ICFParameters' in configStruct:
+            relError = configStruct['ICFParameters']['RelativeError']
+        self.relError = relError
+        # Map of glue mode to the GNDCache of its in flight jobs, as FGS and FASTFGS results differ
+        self.inFlight = {}
+        # Map of leader (rank, reqID) to (glue mode, cache slot, list of waiting (rank, reqID, glueMode, inArgs))
+        self.leaders = {}
+        self.numCoalesced = 0
+        # Only counts leaders whose run time the scheduler reported, so it is None without a core count
+        self.coreHoursSaved = None if self.coresPerJob is None else 0.0
+    def attach(self, rank, reqID, glueMode, inArgs):
+        # Returns True if the request now waits on an in flight job, otherwise it should launch its own
+        if glueMode not in self.inFlight:
+            self.inFlight[glueMode] = GNDCache(self.relError, self.maxInFlight)
+        inFlight = self.inFlight[glueMode]
+        leaderKey = inFlight.lookup(inArgs)
+        if leaderKey is not None:
+            self.leaders[leaderKey][2].append((rank, reqID, glueMode, inArgs))
+            self.numCoalesced += 1
+            return True
+        # Past the cap the job still launches, it just cannot be shared
+        if len(self.leaders) < self.maxInFlight:
+            slot = inFlight.insert(inArgs, (rank, reqID))
+            if slot is not None:
+                self.leaders[(rank, reqID)] = (glueMode, slot, [])
+        return False
+    def isLeader(self, rank, reqID):
+        return (rank, reqID) in self.leaders
+    def dropLeader(self, rank, reqID):
+        # Stops sharing a job that will not write a result
+        #  Returns its waiters as (rank, reqID, glueMode, inArgs) so they can be answered or queued again
+        if (rank, reqID) not in self.leaders:
+            return []
+        (glueMode, slot, waiters) = self.leaders.pop((rank, reqID))
+        self.inFlight[glueMode].remove(slot)
+        self.numCoalesced -= len(waiters)
+        return waiters
+    def fanOut(self, fgDB, watermark, nuWatermark, resultWriter, fgsQueue):
+        # Copies results synced between the two watermarks to anyone waiting on them
+        #   Returns the number of results written
+        if len(self.leaders) == 0 or nuWatermark <= watermark:
+            return 0
+        numWritten = 0
+        finished = []
+        fgDB.openCursor()
+        for row in fgDB.execute(getCoalescedResultSelString(self.solverCode), (watermark, nuWatermark)):
+            leaderKey = (row[1], row[2])
+            if row[0] == self.tag and leaderKey in self.leaders:
+                finished.append((leaderKey, row))
+        fgDB.closeCursor()
+        # Only ask the scheduler about jobs that saved anything
+        runTimes = fgsQueue.takeRunTimes([leaderKey for (leaderKey, row) in finished if len(self.leaders[leaderKey][2]) > 0])
+        for (leaderKey, row) in finished:
+            (glueMode, slot, waiters) = self.leaders.pop(leaderKey)
+            self.inFlight[glueMode].remove(slot)
+            if len(waiters) == 0:
+                fgsQueue.unwatch(*leaderKey)
+            outFGS = BGKOutputs(Viscosity=row[3], ThermalConductivity=row[4], DiffCoeff=list(row[5:15]))
+            for (rank, reqID, waiterMode, inArgs) in waiters:
+                resultWriter.insertResult(rank, self.tag, reqID, outFGS, ResultProvenance(row[15]))
+                numWritten += 1
+            if self.coreHoursSaved is not None and leaderKey in runTimes:
+                self.coreHoursSaved += len(waiters) * self.coresPerJob * runTimes[leaderKey] / 3600.0
+        return numWritten
+    def getStats(self):
+        return (self.numCoalesced, self.coreHoursSaved)
+
+def queueFGSJobs(configStruct, uname, fgsTasks, resultWriter, fgsQueue, fgDB, dbCache, coalescer=None):
+    # fgsTasks holds (rank, reqID, modeSwitch, inArgs) for every task bound for fine grain this iteration
+    #  With a coalescer, tasks matching a job already in flight wait on it instead of launching another
     tag = configStruct['tag']
     # This is a brute force call. We only want an exact LAMMPS result
-    outFGS = None
     # So first, check if we have already found a DB hit on a previous query
-    outFGS = cacheCheck(inArgs, configStruct, dbCache)
-    # If no hit, we check the DB
-    if outFGS == None:
-        selQuery = getGNDStringAndTuple(inArgs, configStruct)
-        fgDB.openCursor()
-        for row in fgDB.execute(selQuery[0], selQuery[1]):
-            if isinstance(inArgs, BGKInputs):
-                if row[22] == getGroundishTruthVersion(SolverCode.BGK):
-                    outFGS = BGKOutputs(Viscosity=row[10], ThermalConductivity=row[11], DiffCoeff=row[12:22])
-            elif isinstance(inArgs, BGKMassesInputs):
-                if row[26] == getGroundishTruthVersion(SolverCode.BGKMASSES):
-                    outFGS = BGKMassesOutputs(Viscosity=row[14], ThermalConductivity=row[15], DiffCoeff=row[16:26])
-        fgDB.closeCursor()
-        # Did we get a hit?
-        if outFGS != None:
+    outputs = [dbCache.lookup(task[3]) for task in fgsTasks]
+    # Then check the DB for everything the cache missed in one go
+    missIndices = [i for (i, outFGS) in enumerate(outputs) if outFGS is None]
+    (isHit, dbOutputs) = lookupGNDBatch([fgsTasks[i][3] for i in missIndices], configStruct, fgDB)
+    for (i, taskIsHit, outFGS) in zip(missIndices, isHit, dbOutputs):
+        if taskIsHit:
             # Put it in the DBCache for later
-            #TODO: Cap the size of this cache
-            dbCache.append((inArgs, outFGS))
-    #Did we get a hit from either?
-    if outFGS != None:
-        # We had a hit, so send that
-        insertResult(rank, tag, reqID, outFGS, ResultProvenance.DB, cgDB)
-    else:
+            dbCache.insert(fgsTasks[i][3], outFGS)
+            outputs[i] = outFGS
+    for ((rank, reqID, modeSwitch, inArgs), outFGS) in zip(fgsTasks, outputs):
+        #Did we get a hit from either?
+        if outFGS is not None:
+            # We had a hit, so send that
+            resultWriter.insertResult(rank, tag, reqID, outFGS, ResultProvenance.DB)
         # Nope, so now we see if we need an FGS job
-        if useAnalyticSolution(inArgs):
+        elif useAnalyticSolution(inArgs):
             # It was, so let's get that solution
             results = getAnalyticSolution(inArgs)
-            insertResult(rank, tag, reqID, results, ResultProvenance.FGS, cgDB)
+            resultWriter.insertResult(rank, tag, reqID, results, ResultProvenance.FGS)
             # TODO: Apparently we never wrote valid analytic solutions to ground truth table
             #  Do we want to? Probably?
+        elif coalescer is not None and coalescer.attach(rank, reqID, modeSwitch, inArgs):
+            # Its result gets copied over once the matching job finishes
+            continue
         else:
+            # A leader's run time goes towards the core hours its waiters saved
+            if coalescer is not None and coalescer.isLeader(rank, reqID):
+                fgsQueue.watch(rank, reqID)
             # Call fgs with args as scheduled job
-            # job will write result back
-            launchedJob = False
-            while(launchedJob == False):
-                queueJob = getQueueUsability(uname, configStruct)
-                if queueJob == True:
-                    print("Processing REQ=" + str(reqID))
-                    buildAndLaunchFGSJob(configStruct, rank, uname, reqID, inArgs, modeSwitch)
-                    launchedJob = True
+            # job will write result back once the scheduler has room for it
+            fgsQueue.submit(rank, reqID, inArgs, modeSwitch)
+
+def writeFailedFGSResults(configStruct, fgsQueue, resultWriter, coalescer=None):
+    # Answers every request whose fine grain job could not be submitted so the solver does not wait on it forever
+    #  Including anything the coalescer had waiting on that job. Returns the number of results written
+    #  The analytic solution is the best answer left, and ANALYTIC is a provenance the solvers already know
+    tag = configStruct['tag']
+    failedTasks = []
+    for (rank, reqID, inArgs, glueMode) in fgsQueue.takeFailed():
+        failedTasks.append((rank, reqID, inArgs))
+        if coalescer is not None:
+            failedTasks += [(waiter[0], waiter[1], waiter[3]) for waiter in coalescer.dropLeader(rank, reqID)]
+    for (rank, reqID, inArgs) in failedTasks:
+        if not useAnalyticSolution(inArgs):
+            print("Answering RANK=" + str(rank) + " REQ=" + str(reqID) + " with the analytic solution outside its valid coupling range", file=sys.stderr)
+        resultWriter.insertResult(rank, tag, reqID, getAnalyticSolution(inArgs), ResultProvenance.ANALYTIC)
+    return len(failedTasks)
+
+def requeueOrphanedFGSTasks(configStruct, uname, resultWriter, fgsQueue, fgDB, dbCache, coalescer):
+    # A job skipped as already built was launched by an earlier run, so its result may never reach fanOut
+    #  Its waiters go back through queueFGSJobs, which picks up a DB hit or elects a new leader
+    orphans = []
+    for (rank, reqID, inArgs, glueMode) in fgsQueue.takeAlreadyBuilt():
+        orphans += coalescer.dropLeader(rank, reqID)
+    if len(orphans) > 0:
+        queueFGSJobs(configStruct, uname, orphans, resultWriter, fgsQueue, fgDB, dbCache, coalescer)
+    return len(orphans)
 
 def useAnalyticSolution(inputStruct):
     if isinstance(inputStruct, BGKInputs):
@@ -726,6 +1260,60 @@ def getAnalyticSolution(inArgs):
     else:
         raise Exception('Using Unsupported Analytic Solver')
 
+def pollRankRequests(packetType, tag, rank, latestID, missingIDs, cgDB):
+    selString = getSelString(packetType, latestID, missingIDs)
+    selArgs = (rank, tag)
+    resultQueue = []
+    # SELECT request
+    cgDB.openCursor()
+    for row in cgDB.execute(selString, selArgs):
+        # Process row for later
+        (solverInput, reqType) = processReqRow(row, packetType)
+        # (reqID, alMode, inputTuple)
+        resultQueue.append((row[2], reqType, solverInput))
+    cgDB.closeCursor()
+    return resultQueue
+
+def pollBatchedRequests(packetType, tag, highWater, cgDB):
+    selString = getBatchedSelString(packetType)
+    selArgs = (highWater, tag)
+    # Map of rank to list of (reqID, alMode, inputTuple)
+    rankQueues = {}
+    # One SELECT for every rank
+    cgDB.openCursor()
+    for row in cgDB.execute(selString, selArgs):
+        if row[0] > highWater:
+            highWater = row[0]
+        # Strip ROWID so row matches the layout processReqRow expects
+        reqRow = row[1:]
+        (solverInput, reqType) = processReqRow(reqRow, packetType)
+        rankQueues.setdefault(reqRow[1], []).append((reqRow[2], reqType, solverInput))
+    cgDB.closeCursor()
+    return (highWater, rankQueues)
+
+def queueRankRequests(reqEntry, resultQueue, taskQueue):
+    rank = reqEntry[0]
+    latestID = reqEntry[1]
+    missingIDs = reqEntry[2]
+    #Get latest received request ID
+    if len(resultQueue) > 0:
+        newLatestID = max(resultQueue, key=lambda i: i[0])[0]
+        #If that latest ID is more laterest than our old latest
+        if newLatestID > latestID:
+            # Add what we were missing
+            missingIDs.addRange(latestID+1, newLatestID+1)
+            # And update latestID
+            reqEntry[1] = newLatestID
+        #And then process those results
+        for result in resultQueue:
+            # Were we looking for this?
+            if result[0] in missingIDs:
+                # We were, so lets queue it
+                #Format is (rank, reqID, alMode, inputTuple)
+                newTask = (rank, result[0], result[1], result[2])
+                taskQueue.append(newTask)
+                missingIDs.remove(result[0])
+
 def pollAndProcessFGSRequests(configStruct, uname):
     numRanks = configStruct['ExpectedMPIRanks']
     defaultMode = configStruct['glueCodeMode']
@@ -734,22 +1322,63 @@ def pollAndProcessFGSRequests(configStruct, uname):
     alBackend = configStruct['alBackend']
     GNDthreshold = configStruct['ActiveLearningVariables']['GNDthreshold']
     numALRequesters = configStruct['ActiveLearningVariables']['NumberOfRequestingActiveLearners']
+    ingestionMode = IngestionMode.PERRANK
+    if 'IngestionMode' in configStruct:
+        ingestionMode = configStruct['IngestionMode']
 
     # One task queue to rule them (the ranks) all
     taskQueue = []
+    # Active learner tasks deferred so they can be evaluated as one batch
+    alTasks = []
+    # Fine grain tasks deferred so ground truth is queried once per iteration
+    fgsTasks = []
     # Array to handle missing requests
-    reqArray = [[i-numALRequesters, -1, []] for i in range(0, numRanks + numALRequesters)]
+    reqArray = [[i-numALRequesters, -1, IntervalSet()] for i in range(0, numRanks + numALRequesters)]
+    # Highest ROWID of BGKREQS seen when using batched ingestion
+    reqHighWater = 0
+    # Highest ROWID of fine grain BGKRESULTS already copied to the coarse grain DB
+    resultWatermark = 0
     # Cache for DB hits
-    dbCache = []
+    dbCache = getGNDCache(configStruct)
 
     #Set up database handles
     cgDBSettings = configStruct['DatabaseSettings']['CoarseGrainDB']
     cgDB = getDBHandle(cgDBSettings, True)
     fgDBSettings = configStruct['DatabaseSettings']['FineGrainDB']
     fgDB = getDBHandle(fgDBSettings)
+    #Bring DB files from older runs up to date, which also backfills the ground truth R*Tree
+    for db in [cgDB, fgDB]:
+        createSQLIndexes(packetType, db)
+
+    #Hold fine grain jobs until the scheduler has room
+    fgsQueue = FGSJobQueue(configStruct, uname)
+    #And share jobs between requests for the same inputs
+    coalescer = FGSCoalescer(configStruct)
+    #Set up how we wait when there is nothing to do, waking early when a background job finishes
+    idleSettings = {}
+    if 'IdleSettings' in configStruct:
+        idleSettings = configStruct['IdleSettings']
+    idleHandle = getIdleHandle(idleSettings, cgDB, fgsQueue.jobFinished)
+    #And batch up result writes
+    batchSettings = {}
+    if 'ResultBatching' in configStruct:
+        batchSettings = configStruct['ResultBatching']
+    resultWriter = ResultWriter(cgDB, packetType, batchSettings)
+
+    #Retrain models off the main loop, waking it when a new model is ready
+    trainer = None
+    interpModel = None
+    if defaultMode == ALInterfaceMode.ACTIVELEARNER:
+        trainer = BackgroundTrainer(configStruct, getGroundishTruthVersion(packetType), fgsQueue.jobFinished)
 
     #Get starting GNDCount of 0
     GNDcnt = 0
+    if defaultMode == ALInterfaceMode.ACTIVELEARNER:
+        # Resume from a registered model so a restart only retrains once the DB moves past GNDthreshold
+        latestModel = trainer.loadLatest(getGNDCount(fgDB, packetType))
+        if latestModel is not None:
+            (modelVersion, learnerModel, GNDcnt) = latestModel
+            interpModel = wrapLearnerModel(alBackend, learnerModel)
     #And start the glue loop
     keepSpinning = True
     print("Starting Loop")
@@ -758,48 +1387,41 @@ def pollAndProcessFGSRequests(configStruct, uname):
         #Logic to not hammer DB/learner with unnecessary retraining requests
         # TODO: Ground truths from fine grain, not coarse grain
         nuGNDcnt = getGNDCount(fgDB, packetType)
-        if defaultMode == ALInterfaceMode.ACTIVELEARNER and ((nuGNDcnt - GNDcnt) > GNDthreshold or GNDcnt == 0):
-            with open('alLog.out', 'w') as alOut, open('alLog.err', 'w') as alErr:
-                with redirect_stdout(alOut), redirect_stdout(alErr):
-                    interpModel = getInterpModel(packetType, alBackend, fgDB)
-            GNDcnt = nuGNDcnt
+        if defaultMode == ALInterfaceMode.ACTIVELEARNER:
+            # Also retry a failed retrain, once the trainer's backoff allows it
+            needsRetrain = (nuGNDcnt - GNDcnt) > GNDthreshold or GNDcnt == 0 or trainer.numFailures > 0
+            if needsRetrain and trainer.canRetrain(nuGNDcnt):
+                trainer.startRetrain(nuGNDcnt)
+                GNDcnt = nuGNDcnt
+            # Keep serving with the current model and swap once the retrain lands
+            #  Never block, learner tasks go to fine grain until the first model lands and a failed retrain keeps the old one
+            #  The trainer sets the loop's wake event when a retrain finishes so the swap is prompt
+            nuModel = trainer.getModel()
+            if nuModel is not None:
+                (modelVersion, learnerModel) = nuModel
+                interpModel = wrapLearnerModel(alBackend, learnerModel)
         #Now populate the task queue
-        for i in range(0, numRanks + numALRequesters):
-            rank = reqArray[i][0]
-            latestID = reqArray[i][1]
-            missingIDs = reqArray[i][2]
-            selString = getSelString(packetType, latestID, missingIDs)
-            selArgs = (rank, tag)
-            resultQueue = []
-            # SELECT request
-            cgDB.openCursor()
-            for row in cgDB.execute(selString, selArgs):
-                # Process row for later
-                (solverInput, reqType) = processReqRow(row, packetType)
-                # (reqID, alMode, inputTuple)
-                resultQueue.append((row[2], reqType, solverInput))
-            cgDB.closeCursor()
-            #Get latest received request ID
-            if len(resultQueue) > 0:
-                newLatestID = max(resultQueue, key=lambda i: i[0])[0]
-                #If that latest ID is more laterest than our old latest
-                if newLatestID > latestID:
-                    # Add what we were missing
-                    missingIDs += range(latestID+1, newLatestID+1)
-                    # And update latestID
-                    reqArray[i][1] = newLatestID
-                #And then process those results
-                for result in resultQueue:
-                    # Were we looking for this?
-                    if result[0] in missingIDs:
-                        # We were, so lets queue it
-                        #Format is (rank, reqID, alMode, inputTuple)
-                        newTask = (rank, result[0], result[1], result[2])
-                        taskQueue.append(newTask)
-                        missingIDs.remove(result[0])
+        if ingestionMode == IngestionMode.BATCHED:
+            # One query for all ranks, then sort rows into per-rank state
+            (reqHighWater, rankQueues) = pollBatchedRequests(packetType, tag, reqHighWater, cgDB)
+            for rank, resultQueue in rankQueues.items():
+                i = rank + numALRequesters
+                if i >= 0 and i < numRanks + numALRequesters:
+                    queueRankRequests(reqArray[i], resultQueue, taskQueue)
+        elif ingestionMode == IngestionMode.PERRANK:
+            for i in range(0, numRanks + numALRequesters):
+                rank = reqArray[i][0]
+                latestID = reqArray[i][1]
+                missingIDs = reqArray[i][2]
+                resultQueue = pollRankRequests(packetType, tag, rank, latestID, missingIDs, cgDB)
+                queueRankRequests(reqArray[i], resultQueue, taskQueue)
+        else:
+            raise Exception('Using Unsupported Ingestion Mode')
         #And now we process that task queue
         #TODO: Refactor slurm/flux queue logic up to here for throttling active jobs
         for task in taskQueue:
+            # Keep buffered results from waiting past the latency threshold
+            resultWriter.checkFlush()
             # A shim to reuse old logic
             rank = task[0]
             reqID = task[1]
@@ -810,24 +1432,11 @@ def pollAndProcessFGSRequests(configStruct, uname):
             if requestedMode != ALInterfaceMode.DEFAULT:
                 modeSwitch = requestedMode
             if modeSwitch == ALInterfaceMode.FGS or modeSwitch == ALInterfaceMode.FASTFGS:
-                # Submit as LAMMPS job
-                queueFGSJob(configStruct, uname, reqID, taskArgs, rank, modeSwitch, cgDB, fgDB, dbCache)
+                # Looked up against ground truth together with every other fine grain task below
+                fgsTasks.append((rank, reqID, modeSwitch, taskArgs))
             elif modeSwitch == ALInterfaceMode.ACTIVELEARNER:
-                # General (Active) Learner
-                #  model = getLatestModelFromLearners()
-                #  (isLegitPerUQ, outputs) = model(inputs)
-                #  if isLegitPerUQ:
-                #      return outputs
-                #  else:
-                #      outputs = fineScaleSim(inputs)
-                #      queueUpdateModel(inputs, outputs)
-                #      return outputs
-                (isLegit, output) = interpModel(taskArgs)
-                insertALPrediction(taskArgs, output, packetType, cgDB)
-                if isLegit:
-                    insertResult(rank, tag, reqID, output, ResultProvenance.ACTIVELEARNER, cgDB)
-                else:
-                    queueFGSJob(configStruct, uname, reqID, taskArgs, rank, ALInterfaceMode.FGS, cgDB, fgDB, dbCache)
+                # Evaluated together with every other learner task below
+                alTasks.append(task)
             elif modeSwitch == ALInterfaceMode.FAKE:
                 if packetType == SolverCode.BGK:
                     # Simplest stencil imaginable
@@ -835,7 +1444,7 @@ def pollAndProcessFGSRequests(configStruct, uname):
                     bgkOutput = BGKOutputs(Viscosity=0.0, ThermalConductivity=0.0, DiffCoeff=[0.0]*10)
                     bgkOutput.DiffCoeff[7] = (bgkInput.Temperature + bgkInput.Density[0] +  bgkInput.Charges[3]) / 3
                     # Write the result
-                    insertResult(rank, tag, reqID, bgkOutput, ResultProvenance.FAKE, cgDB)
+                    resultWriter.insertResult(rank, tag, reqID, bgkOutput, ResultProvenance.FAKE)
                 else:
                     raise Exception('Using Unsupported Solver Code')
             elif modeSwitch == ALInterfaceMode.ANALYTIC:
@@ -846,19 +1455,80 @@ def pollAndProcessFGSRequests(configStruct, uname):
                     (cond, visc, diffCoeff) = ICFAnalytical_solution(taskArgs.Density, taskArgs.Charges, taskArgs.Temperature)
                     bgkOutput = BGKOutputs(Viscosity=visc, ThermalConductivity=cond, DiffCoeff=diffCoeff)
                     # Write the result
-                    insertResult(rank, tag, reqID, bgkOutput, ResultProvenance.ANALYTIC, cgDB)
+                    resultWriter.insertResult(rank, tag, reqID, bgkOutput, ResultProvenance.ANALYTIC)
                 else:
                     raise Exception('Using Unsupported Analytic Solution')
             elif modeSwitch == ALInterfaceMode.KILL:
                 keepSpinning = False
+        #Without a model yet, learner tasks are answered by fine grain instead
+        if len(alTasks) > 0 and interpModel is None:
+            fgsTasks += [(task[0], task[1], ALInterfaceMode.FGS, task[3]) for task in alTasks]
+            del(alTasks[:])
+        #And run every learner task from this iteration as one batch
+        if len(alTasks) > 0:
+            # General (Active) Learner
+            #  model = getLatestModelFromLearners()
+            #  (isLegitPerUQ, outputs) = model(inputs)
+            #  if isLegitPerUQ:
+            #      return outputs
+            #  else:
+            #      outputs = fineScaleSim(inputs)
+            #      queueUpdateModel(inputs, outputs)
+            #      return outputs
+            (isLegit, outputs) = interpModel.batch([task[3] for task in alTasks])
+            for (task, taskIsLegit, output) in zip(alTasks, isLegit, outputs):
+                (rank, reqID, requestedMode, taskArgs) = task
+                resultWriter.insertALPrediction(taskArgs, output)
+                if taskIsLegit:
+                    resultWriter.insertResult(rank, tag, reqID, output, ResultProvenance.ACTIVELEARNER)
+                else:
+                    # Only the rejected rows go to fine grain
+                    fgsTasks.append((rank, reqID, ALInterfaceMode.FGS, taskArgs))
+            del(alTasks[:])
+        #And submit every fine grain task from this iteration as one batch
+        if len(fgsTasks) > 0:
+            queueFGSJobs(configStruct, uname, fgsTasks, resultWriter, fgsQueue, fgDB, dbCache, coalescer)
+            del(fgsTasks[:])
+        #Remember if we had anything to do before emptying the queue
+        foundWork = len(taskQueue) > 0
         #And empty out the task queue....
         del(taskQueue[:])
-        #And now merge and purge buffer tables
-        #First we want to copy the fast local results to the right table of the shared db
-        mergeBufferTable(SolverCode.BGK, cgDB)
+        #Launch whatever fine grain jobs the scheduler now has room for
+        fgsQueue.drain()
+        #And tell requesters about any the scheduler kept rejecting
+        writeFailedFGSResults(configStruct, fgsQueue, resultWriter, coalescer)
+        #And find a new job for anyone sharing one an earlier run already launched
+        requeueOrphanedFGSTasks(configStruct, uname, resultWriter, fgsQueue, fgDB, dbCache, coalescer)
+        #And now write everything we buffered, which also merges and purges buffer tables
+        resultWriter.flush()
         #And then copy in the coarse grain results
-        pullGlobalResultsToFastDBPython(SolverCode.BGK, cgDB, fgDB)
+        nuResultWatermark = pullGlobalResultsToFastDB(SolverCode.BGK, cgDB, fgDB, resultWatermark)
+        #Including for every request that was waiting on one of them
+        if coalescer.fanOut(fgDB, resultWatermark, nuResultWatermark, resultWriter, fgsQueue) > 0:
+            resultWriter.flush()
+        resultWatermark = nuResultWatermark
+        #And wait for more work if we did not have any
+        if keepSpinning:
+            idleHandle.wait(foundWork)
     print("Loop Done")
+    (idleTime, workTime) = idleHandle.getTimes()
+    print("Idle Time: " + str(idleTime) + "s, Working Time: " + str(workTime) + "s")
+    (cacheHits, cacheMisses, cacheEvictions) = dbCache.getStats()
+    print("GND Cache Hits: " + str(cacheHits) + ", Misses: " + str(cacheMisses) + ", Evictions: " + str(cacheEvictions))
+    (numCoalesced, coreHoursSaved) = coalescer.getStats()
+    if coreHoursSaved is None:
+        print("Coalesced FGS Requests: " + str(numCoalesced) + ", Core Hours Saved: unknown without SlurmScheduler CoresPerNode")
+    else:
+        print("Coalesced FGS Requests: " + str(numCoalesced) + ", Core Hours Saved: " + str(coreHoursSaved))
+    #Do not drop fine grain jobs that were still waiting on the scheduler
+    fgsQueue.drain(block=True)
+    while requeueOrphanedFGSTasks(configStruct, uname, resultWriter, fgsQueue, fgDB, dbCache, coalescer) > 0:
+        fgsQueue.drain(block=True)
+    if writeFailedFGSResults(configStruct, fgsQueue, resultWriter, coalescer) > 0:
+        resultWriter.flush()
+    fgsQueue.close()
+    if trainer is not None:
+        trainer.close()
     #Close SQL Connection
     cgDB.closeDB()
     fgDB.closeDB()
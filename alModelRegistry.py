@@ -0,0 +1,50 @@
+import os
+import json
+import fcntl
+
+class ModelRegistry:
+    """On disk index of published active learning models
+
+    Each entry records which tag, fine grain DB, solver code, learner
+    backend, number of GND rows and GND version a model was trained with,
+    so a restarted glue loop can pick a compatible model back up instead
+    of retraining. Runs sharing a ModelDirectory only see their own models"""
+    def __init__(self, modelDir: str):
+        self.indexPath = os.path.join(modelDir, "registry.json")
+        self.lockPath = os.path.join(modelDir, "registry.lock")
+    def getEntries(self):
+        if not os.path.exists(self.indexPath):
+            return []
+        with open(self.indexPath) as indexFile:
+            return json.load(indexFile)
+    def register(self, entry: dict):
+        # Entries hold tag, fineGrainDB, solverCode, alBackend, gndCount, gndVersion, version, artifactPath and servingPath
+        #  Glue codes sharing the directory take turns through the lock file so no entry is lost
+        with open(self.lockPath, 'w') as lockFile:
+            fcntl.flock(lockFile, fcntl.LOCK_EX)
+            entries = self.getEntries()
+            entries.append(entry)
+            # Write then rename so a reader never sees a partial index
+            tmpPath = self.indexPath + ".tmp"
+            with open(tmpPath, 'w') as indexFile:
+                json.dump(entries, indexFile, indent=1)
+            os.replace(tmpPath, self.indexPath)
+    def getLatestVersion(self):
+        return max([entry["version"] for entry in self.getEntries()], default=0)
+    def findLatest(self, tag, fineGrainDB, solverCode, alBackend, gndVersion, maxGNDCount):
+        # Newest model trained on at most maxGNDCount rows of the same GND version in the same fine grain DB
+        #   A model trained on more rows than the DB now holds came from a different DB
+        #   Entries from before tag and fineGrainDB were recorded never match
+        bestEntry = None
+        for entry in self.getEntries():
+            if entry.get("tag") != tag or entry.get("fineGrainDB") != fineGrainDB:
+                continue
+            if entry["solverCode"] != solverCode.value or entry["alBackend"] != alBackend.value:
+                continue
+            if entry["gndVersion"] != gndVersion or entry["gndCount"] > maxGNDCount:
+                continue
+            if not os.path.exists(entry["servingPath"]):
+                continue
+            if bestEntry is None or (entry["gndCount"], entry["version"]) > (bestEntry["gndCount"], bestEntry["version"]):
+                bestEntry = entry
+        return bestEntry
@@ -0,0 +1,246 @@
+import os
+import sys
+import signal
+import time
+import pickle
+import threading
+import multiprocessing
+from contextlib import redirect_stdout, redirect_stderr
+from glueCodeTypes import LearnerBackend, DatabaseMode
+from alDBHandlers import getDBHandle
+from alModelRegistry import ModelRegistry
+
+def retrainModelArtifact(alBackend, fgDBSettings, artifactPath, previousArtifactPath=None, trainingSettings={}, searchCachePath=None):
+    # Runs in the trainer process: trains against the fine grain DB and publishes the learner model
+    #   previousArtifactPath is the model to warm start from if the backend supports it
+    #   trainingSettings holds the optional TrainingWorkers, ThreadsPerTrainingWorker and InferencePrecision
+    #   searchCachePath is where hyperparameter search results are kept between retrains
+    #   Returns (artifactPath, seconds spent training)
+    startTime = time.perf_counter()
+    with open('alLog.out', 'a') as alOut, open('alLog.err', 'a') as alErr:
+        with redirect_stdout(alOut), redirect_stderr(alErr):
+            fgDB = getDBHandle(fgDBSettings)
+            if alBackend == LearnerBackend.PYTORCH:
+                import torch
+                import nn_learner
+                previousModel = None
+                if previousArtifactPath is not None:
+                    with open(previousArtifactPath, 'rb') as artifactFile:
+                        previousModel = pickle.load(artifactFile)
+                learningConfig = dict(nn_learner.DEFAULT_LEARNING_CONFIG)
+                ensembleConfig = dict(learningConfig["ensemble_config"])
+                ensembleConfig["n_workers"] = trainingSettings.get("TrainingWorkers", ensembleConfig["n_workers"])
+                ensembleConfig["threads_per_worker"] = trainingSettings.get("ThreadsPerTrainingWorker", ensembleConfig["threads_per_worker"])
+                learningConfig["ensemble_config"] = ensembleConfig
+                inferenceConfig = dict(learningConfig["inference_config"])
+                inferencePrecision = trainingSettings.get("InferencePrecision", 64)
+                if inferencePrecision == 32:
+                    inferenceConfig["dtype"] = torch.float32
+                elif inferencePrecision != 64:
+                    raise Exception('Using Unsupported Inference Precision')
+                learningConfig["inference_config"] = inferenceConfig
+                model = nn_learner.retrain(fgDB, learning_config=learningConfig, previous_model=previousModel)
+            elif alBackend == LearnerBackend.RANDFOREST:
+                import rf_learner
+                model = rf_learner.retrain(fgDB, search_cache_path=searchCachePath)
+            else:
+                raise Exception('Using Unsupported Active Learning Backend')
+            fgDB.closeDB()
+    trainTime = time.perf_counter() - startTime
+    publishArtifact(artifactPath, lambda artifactFile: pickle.dump(model, artifactFile))
+    servingPath = artifactPath
+    if alBackend == LearnerBackend.PYTORCH:
+        # The glue serves the torch free export, the pickle is only kept to warm start the next retrain
+        servingPath = os.path.splitext(artifactPath)[0] + ".npz"
+        publishArtifact(servingPath, lambda artifactFile: nn_learner.export_npz(model, artifactFile))
+    return (servingPath, trainTime)
+
+def getFineGrainDBID(fgDBSettings):
+    # Identifies the fine grain DB a model was trained against, however its path was spelled
+    if fgDBSettings['DatabaseMode'] == DatabaseMode.SQLITE:
+        return os.path.realpath(fgDBSettings['DatabaseURL'])
+    return fgDBSettings['DatabaseURL']
+
+def publishArtifact(path, writeFunc):
+    # Write then rename so a reader never sees a partial artifact
+    tmpPath = path + ".tmp"
+    with open(tmpPath, 'wb') as artifactFile:
+        writeFunc(artifactFile)
+    os.replace(tmpPath, path)
+
+def loadArtifact(path):
+    if path.endswith(".npz"):
+        import nn_inference
+        return nn_inference.load_model(path)
+    with open(path, 'rb') as artifactFile:
+        return pickle.load(artifactFile)
+
+def runRetrainProcess(resultConn, *retrainArgs):
+    # Entry point of the trainer process, sends (result, error string) back to the glue loop
+    #  Leads its own process group so close can stop it along with any training workers it starts
+    os.setpgrp()
+    try:
+        resultConn.send((retrainModelArtifact(*retrainArgs), None))
+    except Exception as err:
+        resultConn.send((None, repr(err)))
+    resultConn.close()
+
+class BackgroundTrainer:
+    """Retrains active learning models in a separate worker process
+
+    The glue loop keeps serving with its current model while a retrain
+    runs. Each retrain publishes a versioned artifact that the loop
+    picks up with getModel and swaps in between iterations. Published
+    models are recorded in a registry so a restart can resume from them.
+    After a failed retrain the next one waits RetrainBackoff seconds,
+    doubling with each failure in a row"""
+    def __init__(self, configStruct, gndVersion, wakeEvent=None):
+        self.alBackend = configStruct['alBackend']
+        self.solverCode = configStruct['solverCode']
+        self.tag = configStruct['tag']
+        self.gndVersion = gndVersion
+        self.fgDBSettings = configStruct['DatabaseSettings']['FineGrainDB']
+        self.fineGrainDB = getFineGrainDBID(self.fgDBSettings)
+        self.modelDir = configStruct['ActiveLearningVariables'].get('ModelDirectory', 'alModels')
+        self.artifactPrefix = configStruct['tag'] + "_" + self.alBackend.name
+        self.searchCachePath = os.path.join(self.modelDir, self.artifactPrefix + "_search.json")
+        # Warm start each retrain from the last published model
+        self.incremental = configStruct['ActiveLearningVariables'].get('IncrementalRetraining', False)
+        self.latestArtifact = None
+        self.trainingSettings = {}
+        for key in ['TrainingWorkers', 'ThreadsPerTrainingWorker', 'InferencePrecision']:
+            if key in configStruct['ActiveLearningVariables']:
+                self.trainingSettings[key] = configStruct['ActiveLearningVariables'][key]
+        # Optional threading.Event set when a retrain finishes so the loop can swap promptly
+        self.wakeEvent = wakeEvent
+        self.retrainBackoff = configStruct['ActiveLearningVariables'].get('RetrainBackoff', 60.0)
+        self.numFailures = 0
+        self.nextRetrainTime = 0.0
+        self.version = 0
+        self.registry = None
+        self.pending = None
+        self.startTime = 0.0
+        # Spawn so the trainer does not inherit the glue loop's DB connections or threads
+        #  A plain process rather than a pool so the learner can start its own worker pool
+        self.context = multiprocessing.get_context('spawn')
+        if self.alBackend != LearnerBackend.FAKE:
+            os.makedirs(self.modelDir, exist_ok=True)
+            self.registry = ModelRegistry(self.modelDir)
+            # Keep numbering past anything already published so artifacts are never overwritten
+            self.version = self.registry.getLatestVersion()
+    def isTraining(self):
+        return self.pending is not None
+    def canRetrain(self, numGND):
+        # Learners have nothing to fit without ground truth, and a failed retrain waits out its backoff
+        if self.isTraining():
+            return False
+        if numGND == 0 and self.alBackend != LearnerBackend.FAKE:
+            return False
+        return time.perf_counter() >= self.nextRetrainTime
+    def onRetrainFailed(self):
+        self.numFailures += 1
+        # Cap the doubling so a recovered cluster is picked up within the hour
+        backoff = min(self.retrainBackoff * 2 ** (self.numFailures - 1), max(self.retrainBackoff, 3600.0))
+        self.nextRetrainTime = time.perf_counter() + backoff
+        print("Retrain failed " + str(self.numFailures) + " times in a row, next attempt in " + str(backoff) + "s", file=sys.stderr)
+    def waitForRetrain(self, process):
+        process.join()
+        if self.wakeEvent is not None:
+            self.wakeEvent.set()
+    def startRetrain(self, numGND):
+        # Returns False if a retrain is already running
+        if self.isTraining():
+            return False
+        self.version += 1
+        self.startTime = time.perf_counter()
+        print("Retrain v" + str(self.version) + " started with " + str(numGND) + " GND points")
+        if self.alBackend == LearnerBackend.FAKE:
+            # Nothing to train for the stub model
+            self.pending = (self.version, None, None, None, numGND)
+            return True
+        artifactPath = os.path.join(self.modelDir, self.artifactPrefix + "_gnd" + str(numGND) + "_v" + str(self.version) + ".pkl")
+        previousArtifactPath = None
+        if self.incremental:
+            previousArtifactPath = self.latestArtifact
+        (recvConn, sendConn) = self.context.Pipe(duplex=False)
+        process = self.context.Process(
+            target=runRetrainProcess,
+            args=(sendConn, self.alBackend, self.fgDBSettings, artifactPath, previousArtifactPath, self.trainingSettings, self.searchCachePath)
+        )
+        process.start()
+        # Only the trainer holds the sending end, so a crash shows up as EOF
+        sendConn.close()
+        threading.Thread(target=self.waitForRetrain, args=(process,), daemon=True).start()
+        self.pending = (self.version, process, recvConn, artifactPath, numGND)
+        return True
+    def getModel(self, block=False):
+        # Returns (version, learner model) once a retrain has finished, otherwise None
+        #   The stub backend has no learner model so returns (version, None)
+        if self.pending is None:
+            return None
+        (version, process, recvConn, artifactPath, numGND) = self.pending
+        if process is None:
+            self.pending = None
+            return (version, None)
+        if not block and not recvConn.poll():
+            return None
+        self.pending = None
+        try:
+            (result, error) = recvConn.recv()
+        except EOFError:
+            (result, error) = (None, "trainer process exited without a result")
+        recvConn.close()
+        process.join()
+        if error is not None:
+            print("Retrain v" + str(version) + " failed: " + error, file=sys.stderr)
+            self.onRetrainFailed()
+            return None
+        (servingPath, trainTime) = result
+        print("Retrain v" + str(version) + " finished in " + str(trainTime) + "s")
+        loadStart = time.perf_counter()
+        try:
+            model = loadArtifact(servingPath)
+        except Exception as err:
+            print("Retrain v" + str(version) + " failed to load: " + repr(err), file=sys.stderr)
+            self.onRetrainFailed()
+            return None
+        self.numFailures = 0
+        self.latestArtifact = artifactPath
+        self.registry.register({
+            "tag": self.tag,
+            "fineGrainDB": self.fineGrainDB,
+            "solverCode": self.solverCode.value,
+            "alBackend": self.alBackend.value,
+            "gndCount": numGND,
+            "gndVersion": self.gndVersion,
+            "version": version,
+            "artifactPath": artifactPath,
+            "servingPath": servingPath
+        })
+        print("Swapped to model v" + str(version) + " " + str(time.perf_counter() - self.startTime) + "s after retrain start (load took " + str(time.perf_counter() - loadStart) + "s)")
+        return (version, model)
+    def loadLatest(self, numGND):
+        # Returns (version, learner model, GND count it was trained with) for the newest
+        #   registered model compatible with the current fine grain DB, otherwise None
+        if self.registry is None:
+            return None
+        entry = self.registry.findLatest(self.tag, self.fineGrainDB, self.solverCode, self.alBackend, self.gndVersion, numGND)
+        if entry is None:
+            return None
+        loadStart = time.perf_counter()
+        model = loadArtifact(entry["servingPath"])
+        self.latestArtifact = entry["artifactPath"]
+        print("Loaded registered model v" + str(entry["version"]) + " trained with " + str(entry["gndCount"]) + " GND points in " + str(time.perf_counter() - loadStart) + "s")
+        return (entry["version"], model, entry["gndCount"])
+    def close(self):
+        # Abandon any retrain in flight, its result would never be served
+        if self.pending is not None and self.pending[1] is not None:
+            (version, process, recvConn, artifactPath, numGND) = self.pending
+            try:
+                os.killpg(process.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                # Exited, or has not made its process group yet
+                process.terminate()
+            process.join()
+            recvConn.close()
+            self.pending = None
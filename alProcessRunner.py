@@ -0,0 +1,91 @@
+import asyncio
+import concurrent.futures
+import itertools
+import subprocess
+import sys
+import threading
+import time
+
+class AsyncProcessRunner:
+    """Runs subprocesses concurrently on an asyncio event loop
+
+    The event loop lives in a background thread so the glue loop can hand
+    off long running processes (like blocking mode LAMMPS runs) and keep
+    serving requests. At most maxInFlight processes run at once and the
+    rest wait their turn inside the runner"""
+    def __init__(self, maxInFlight: int):
+        self.maxInFlight = maxInFlight
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        # Semaphore has to be created on the loop that uses it
+        self.semaphore = asyncio.run_coroutine_threadsafe(self.makeSemaphore(), self.loop).result()
+        # Map of process ID to future of (returncode, stdout, stderr)
+        self.futures = {}
+        # Map of process ID to (start time, end time or None) once its process has started
+        self.runTimes = {}
+        self.counter = itertools.count()
+    async def makeSemaphore(self):
+        return asyncio.Semaphore(self.maxInFlight)
+    async def runProcess(self, procID, argList):
+        async with self.semaphore:
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *argList,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE
+                )
+            except FileNotFoundError as err:
+                return (None, b"", bytes(str(err), "utf-8"))
+            start = time.perf_counter()
+            self.runTimes[procID] = (start, None)
+            (stdout, stderr) = await proc.communicate()
+            self.runTimes[procID] = (start, time.perf_counter())
+            return (proc.returncode, stdout, stderr)
+    def submit(self, argList, callback=None):
+        # Starts argList without waiting for it and returns a process ID
+        #  callback(procID, (returncode, stdout, stderr)) is called from the runner thread on completion
+        procID = "local-" + str(next(self.counter))
+        future = asyncio.run_coroutine_threadsafe(self.runProcess(procID, argList), self.loop)
+        if callback is not None:
+            future.add_done_callback(lambda f: callback(procID, self.getResult(procID, f)))
+        self.futures[procID] = future
+        return procID
+    def getResult(self, procID, future):
+        # Returns (returncode, stdout, stderr) of a finished future
+        #  A process that raised instead of exiting is reported as failed with a None returncode, which getActive logs
+        try:
+            return future.result()
+        except Exception as err:
+            return (None, b"", bytes("Process " + procID + " failed: " + repr(err), "utf-8"))
+    def getActive(self, procIDs):
+        # Returns the subset of procIDs still waiting or running and forgets finished ones
+        activeIDs = set()
+        for procID in procIDs:
+            future = self.futures.get(procID)
+            if future is None:
+                continue
+            if not future.done():
+                activeIDs.add(procID)
+                continue
+            (returncode, stdout, stderr) = self.getResult(procID, future)
+            if returncode != 0:
+                print(str(stderr, "utf-8"), file=sys.stderr)
+            del self.futures[procID]
+        return activeIDs
+    def takeRunTime(self, procID):
+        # Returns and forgets the seconds procID has been running, up to now if it has not exited, or None if it never started
+        times = self.runTimes.pop(procID, None)
+        if times is None:
+            return None
+        (start, end) = times
+        if end is None:
+            end = time.perf_counter()
+        return end - start
+    def close(self):
+        # Waits for everything submitted and then stops the event loop
+        # Wait without raising, getActive below logs and forgets the failures
+        concurrent.futures.wait(list(self.futures.values()))
+        self.getActive(list(self.futures.keys()))
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
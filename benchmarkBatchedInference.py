@@ -0,0 +1,79 @@
+import sys
+import time
+import numpy as np
+from glueCodeTypes import SolverCode, BGKInputs
+from alInterface import BGKPytorchInterpModel, BGKRandForestInterpModel
+
+def getSyntheticInputs(numRequests, rng):
+    inputs = []
+    for i in range(numRequests):
+        inputs.append(BGKInputs(Temperature=rng.uniform(50.0, 500.0), Density=rng.uniform(1e23, 1e25, 4), Charges=rng.uniform(1.0, 20.0, 4)))
+    return inputs
+
+def getRandForestModel(rng, numTrain=2000):
+    # Fit on random data as only inference throughput matters here
+    import sklearn.ensemble
+    import rf_learner
+    features = rng.uniform(size=(numTrain, 9))
+    labels = rng.uniform(size=(numTrain, 12))
+    forest = sklearn.ensemble.RandomForestRegressor(n_estimators=200, max_depth=10).fit(features, labels)
+    model = rf_learner.BGKModel(SolverCode.BGK, forest, uq_fussyness=2./3., err_info=np.full(12, 0.3))
+    return BGKRandForestInterpModel(model)
+
+def getPytorchModel(rng, stackedInference=False):
+    # Untrained networks with the same shape retrain builds
+    import torch
+    import nn_learner
+    netConfig = nn_learner.DEFAULT_NET_CONFIG
+    nHidden = netConfig["n_hidden"]
+    networks = []
+    for i in range(nn_learner.DEFAULT_ENSEMBLE_CONFIG["n_members"]):
+        inScaler = nn_learner.Scaler(torch.as_tensor(rng.uniform(size=9)), torch.as_tensor(rng.uniform(1.0, 2.0, size=9)))
+        outScaler = nn_learner.Scaler(torch.as_tensor(rng.uniform(size=12)), torch.as_tensor(rng.uniform(1.0, 2.0, size=12)))
+        layers = [inScaler, torch.nn.Linear(9, nHidden), torch.nn.ReLU()]
+        for j in range(netConfig["n_layers"] - 2):
+            layers += [torch.nn.Linear(nHidden, nHidden), torch.nn.ReLU()]
+        layers += [torch.nn.Linear(nHidden, 12), outScaler]
+        network = torch.nn.Sequential(*layers)
+        for param in network.parameters():
+            param.requires_grad_(False)
+        networks.append(network)
+    model = nn_learner.BGKModel(SolverCode.BGK, networks, np.full(12, 0.3), stacked_inference=stackedInference)
+    return BGKPytorchInterpModel(model)
+
+def benchmarkInterpModel(interpModel, inputs, batchSize):
+    # Returns requests per second when tasks are handed over batchSize at a time
+    startTime = time.perf_counter()
+    for i in range(0, len(inputs), batchSize):
+        chunk = inputs[i:i+batchSize]
+        if batchSize == 1:
+            interpModel(chunk[0])
+        else:
+            interpModel.batch(chunk)
+    return len(inputs) / (time.perf_counter() - startTime)
+
+if __name__ == "__main__":
+    backend = "randomforest"
+    if len(sys.argv) > 1:
+        backend = sys.argv[1]
+    numRequests = 1024
+    if len(sys.argv) > 2:
+        numRequests = int(sys.argv[2])
+    rng = np.random.default_rng(42)
+    if backend == "randomforest":
+        interpModel = getRandForestModel(rng)
+    elif backend == "pytorch":
+        interpModel = getPytorchModel(rng)
+    else:
+        raise Exception('Using Unsupported Active Learning Backend')
+    inputs = getSyntheticInputs(numRequests, rng)
+    # Per row and batched paths have to agree before timing means anything
+    (isLegit, outputs) = interpModel.batch(inputs[:16])
+    for (inputStruct, batchIsLegit, batchOutput) in zip(inputs[:16], isLegit, outputs):
+        (rowIsLegit, rowOutput) = interpModel(inputStruct)
+        assert rowIsLegit == batchIsLegit
+        assert np.allclose(rowOutput.DiffCoeff, batchOutput.DiffCoeff)
+    print(backend + " with " + str(numRequests) + " requests")
+    batchSizes = sorted(set([batchSize for batchSize in [1, 8, 64, 512] if batchSize < numRequests] + [numRequests]))
+    for batchSize in batchSizes:
+        print("  batch size " + str(batchSize) + " (req/s): " + str(benchmarkInterpModel(interpModel, inputs, batchSize)))
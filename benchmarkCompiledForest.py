@@ -0,0 +1,39 @@
+import sys
+import time
+import numpy as np
+import sklearn.ensemble
+import rf_learner
+from glueCodeTypes import SolverCode
+
+def getSyntheticFeatures(numRows, rng):
+    # Temperature, 4 densities at the 1e24 scale the glue sees, then 4 charges
+    return np.concatenate([rng.uniform(50.0, 500.0, (numRows, 1)), rng.uniform(1e23, 1e25, (numRows, 4)), rng.uniform(1.0, 20.0, (numRows, 4))], axis=1)
+
+def benchmarkProcess(model, features, numCalls):
+    # Returns seconds per model.process call
+    startTime = time.perf_counter()
+    for i in range(numCalls):
+        model.process(features, perform_column_extraction=False)
+    return (time.perf_counter() - startTime) / numCalls
+
+if __name__ == "__main__":
+    numTrain = 2000
+    if len(sys.argv) > 1:
+        numTrain = int(sys.argv[1])
+    rng = np.random.default_rng(42)
+    features = getSyntheticFeatures(numTrain, rng)
+    labels = np.sin(features[:, :1] / 100.0) + rng.normal(0.0, 0.1, (numTrain, 12))
+    forest = sklearn.ensemble.RandomForestRegressor(n_estimators=200, max_depth=14).fit(features, labels)
+    model = rf_learner.BGKModel(SolverCode.BGK, forest, uq_fussyness=2./3., err_info=np.full(12, 0.3))
+    compiled = rf_learner.CompiledForest(forest)
+    testFeatures = getSyntheticFeatures(10000, rng)
+    reference = np.asarray([tree.predict(testFeatures) for tree in forest.estimators_])
+    print("Matches sklearn exactly: " + str(np.array_equal(compiled.predict_all(testFeatures), reference)))
+    for batchSize in [1, 10, 100, 1000, 10000]:
+        batch = testFeatures[:batchSize]
+        numCalls = max(1, 1000 // batchSize)
+        model.compiled = None
+        sklearnTime = benchmarkProcess(model, batch, numCalls)
+        model.compiled = compiled
+        compiledTime = benchmarkProcess(model, batch, numCalls)
+        print("batch size " + str(batchSize) + " sklearn (s): " + str(sklearnTime) + " compiled (s): " + str(compiledTime) + " speedup: " + str(sklearnTime / compiledTime))
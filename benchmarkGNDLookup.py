@@ -0,0 +1,126 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import numpy as np
+from glueCodeTypes import SolverCode, BGKInputs, DatabaseMode
+from initTables import getSQLTableStrings, getSQLIndexStrings
+from alInterface import getGroundishTruthVersion, getRelErrorBounds, lookupGNDBatch
+from alDBHandlers import getDBHandle
+from glueSQLHelpers import getGNDInputColumns, getGNDRTreeColumns
+
+def getSyntheticGND(numRows, rng):
+    # Temperature, 4 densities at the 1e24 scale the glue sees, 4 charges, then outputs
+    inputs = np.concatenate([rng.uniform(50.0, 500.0, (numRows, 1)), rng.uniform(1e23, 1e25, (numRows, 4)), rng.uniform(1.0, 20.0, (numRows, 4))], axis=1)
+    version = getGroundishTruthVersion(SolverCode.BGK)
+    return [tuple(row) + (version,) + (1.0,) * 12 + (version,) for row in inputs.tolist()]
+
+def getSingleProbeStringAndTuple(fgsArgs, configStruct):
+    # One query per probe, kept only as the reference the batched lookupGNDBatch is measured against
+    selString = ""
+    selTup = ()
+    if isinstance(fgsArgs, BGKInputs):
+        # Percent error acceptable for a match
+        relError = configStruct['ICFParameters']['RelativeError']
+        # Narrow down with the R*Tree first, then check relative error exactly on the candidates
+        #  CROSS JOIN keeps SQLite from driving the lookup off the BGKGND indexes instead
+        selString += "SELECT BGKGND.* FROM BGKGND_RTREE CROSS JOIN BGKGND ON BGKGND.ROWID=BGKGND_RTREE.ID WHERE "
+        inputValues = dict(zip(getGNDInputColumns(SolverCode.BGK), [fgsArgs.Temperature] + list(fgsArgs.Density) + list(fgsArgs.Charges)))
+        # Zero inputs are not matched on below, so they do not bound the box either
+        rtreeValues = [(col, inputValues[col]) for col in getGNDRTreeColumns(SolverCode.BGK) if inputValues[col] != 0.0]
+        for (col, value) in rtreeValues:
+            (lowBound, highBound) = getRelErrorBounds(value, relError)
+            selString += "BGKGND_RTREE.MAX_" + col + " >= ? AND "
+            selTup += (lowBound,)
+            if highBound is not None:
+                selString += "BGKGND_RTREE.MIN_" + col + " <= ? AND "
+                selTup += (highBound,)
+        #Temperature
+        #TODO: Probably verify temperature is not 0 but temperature probably won't be
+        selString += "ABS(? - TEMPERATURE) / TEMPERATURE < ?"
+        selTup += (fgsArgs.Temperature, relError)
+        selString += " AND "
+        #Density
+        for i in range(0, 4):
+            if(fgsArgs.Density[i] != 0.0):
+                selString += "ABS(? - DENSITY_" + str(i) + ") / DENSITY_" + str(i) + " < ?"
+                selTup += (fgsArgs.Density[i], relError)
+                selString += " AND "
+        #Charges
+        for i in range(0, 4):
+            if(fgsArgs.Charges[i] != 0.0):
+                selString += "ABS(? - CHARGES_" + str(i) + ") / CHARGES_" + str(i) + " < ?"
+                selTup += (fgsArgs.Charges[i], relError)
+                selString += " AND "
+        #Version
+        selString += "INVERSION=?;"
+        selTup += (getGroundishTruthVersion(SolverCode.BGK),)
+    else:
+        raise Exception('Using Unsupported Solver Code')
+    return (selString, selTup)
+
+def getScanQuery(selString, selTup):
+    # The per column relative error check on its own, as queried before the R*Tree
+    #  Each ABS predicate takes two arguments and the version check one more
+    numArgs = 2 * selString.count("ABS(") + 1
+    return ("SELECT * FROM BGKGND WHERE " + selString[selString.index("ABS("):], selTup[-numArgs:])
+
+def benchmarkLookups(numRows, numProbes=1000, relError=0.05):
+    # Returns seconds per probe for (scan, R*Tree, R*Tree through the glue DB handle, batched through the glue DB handle)
+    rng = np.random.default_rng(42)
+    configStruct = {'solverCode': SolverCode.BGK, 'ICFParameters': {'RelativeError': relError}}
+    with tempfile.TemporaryDirectory() as tmpDir:
+        sqlDB = sqlite3.connect(os.path.join(tmpDir, "bench.db"))
+        (dropStrings, createStrings) = getSQLTableStrings(SolverCode.BGK)
+        for createString in createStrings:
+            sqlDB.execute(createString)
+        for indexString in getSQLIndexStrings(SolverCode.BGK):
+            sqlDB.execute(indexString)
+        gndRows = getSyntheticGND(numRows, rng)
+        # Goes through the trigger like insertGroundishTruth does
+        sqlDB.executemany("INSERT INTO BGKGND VALUES(" + ", ".join(["?"] * 23) + ");", gndRows)
+        sqlDB.execute("ANALYZE;")
+        sqlDB.commit()
+        # Half the probes are near an existing row, half are fresh points
+        probeInputs = []
+        for i in range(numProbes):
+            row = np.array(gndRows[rng.integers(numRows)][:9])
+            if i % 2 == 0:
+                row = row * (1.0 + rng.uniform(-relError / 2.0, relError / 2.0, 9))
+            else:
+                row = getSyntheticGND(1, rng)[0][:9]
+            probeInputs.append(BGKInputs(Temperature=row[0], Density=list(row[1:5]), Charges=list(row[5:9])))
+        probes = [getSingleProbeStringAndTuple(probeInput, configStruct) for probeInput in probeInputs]
+        startTime = time.perf_counter()
+        scanResults = [sqlDB.execute(*getScanQuery(selString, selTup)).fetchall() for (selString, selTup) in probes]
+        scanTime = (time.perf_counter() - startTime) / numProbes
+        startTime = time.perf_counter()
+        rtreeResults = [sqlDB.execute(selString, selTup).fetchall() for (selString, selTup) in probes]
+        rtreeTime = (time.perf_counter() - startTime) / numProbes
+        # The R*Tree only prunes, it must never change which rows match
+        assert [sorted(rows) for rows in scanResults] == [sorted(rows) for rows in rtreeResults]
+        sqlDB.close()
+        # The glue reconnects to the fine grain DB around every query
+        fgDB = getDBHandle({'DatabaseMode': DatabaseMode.SQLITE, 'DatabaseURL': os.path.join(tmpDir, "bench.db")})
+        startTime = time.perf_counter()
+        for (selString, selTup) in probes:
+            fgDB.openCursor()
+            fgDB.execute(selString, selTup).fetchall()
+            fgDB.closeCursor()
+        handleTime = (time.perf_counter() - startTime) / numProbes
+        startTime = time.perf_counter()
+        (isHit, outputs) = lookupGNDBatch(probeInputs, configStruct, fgDB)
+        batchTime = (time.perf_counter() - startTime) / numProbes
+        # Last matching row wins in both
+        assert [len(rows) > 0 for rows in rtreeResults] == isHit.tolist()
+        return (scanTime, rtreeTime, handleTime, batchTime)
+
+if __name__ == "__main__":
+    tableSizes = [1000, 10000, 100000, 1000000]
+    if len(sys.argv) > 1:
+        tableSizes = [int(arg) for arg in sys.argv[1:]]
+    print("#Rows ScanProbe(us) RTreeProbe(us) PerQueryProbe(us) BatchedProbe(us)")
+    for numRows in tableSizes:
+        (scanTime, rtreeTime, handleTime, batchTime) = benchmarkLookups(numRows)
+        print(numRows, scanTime * 1e6, rtreeTime * 1e6, handleTime * 1e6, batchTime * 1e6)
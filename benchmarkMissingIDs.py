@@ -0,0 +1,59 @@
+import sys
+import time
+import numpy as np
+from glueIntervalSet import IntervalSet
+
+def benchmarkMissingIDs(missingIDs, numOutstanding, numOps=100000, fragmented=False):
+    # Mirror queueRankRequests: grow by a batch, then test and remove arrivals
+    #  If fragmented, every other ID in the batch has already arrived so each missing ID is its own interval
+    rng = np.random.default_rng(42)
+    startTime = time.perf_counter()
+    if fragmented:
+        missingIDRange = range(0, 2 * numOutstanding, 2)
+        if isinstance(missingIDs, IntervalSet):
+            for reqID in missingIDRange:
+                missingIDs.add(reqID)
+        else:
+            missingIDs += missingIDRange
+    else:
+        missingIDRange = range(0, numOutstanding)
+        if isinstance(missingIDs, IntervalSet):
+            missingIDs.addRange(0, numOutstanding)
+        else:
+            missingIDs += missingIDRange
+    addTime = time.perf_counter() - startTime
+    arrivals = [missingIDRange[i] for i in rng.permutation(numOutstanding)[:numOps].tolist()]
+    startTime = time.perf_counter()
+    for reqID in arrivals:
+        if reqID in missingIDs:
+            missingIDs.remove(reqID)
+    removeTime = (time.perf_counter() - startTime) / len(arrivals)
+    startTime = time.perf_counter()
+    if isinstance(missingIDs, IntervalSet):
+        minID = missingIDs.min()
+    else:
+        minID = min(missingIDs)
+    minTime = time.perf_counter() - startTime
+    return (addTime, removeTime, minTime)
+
+if __name__ == "__main__":
+    numOutstanding = 1000000
+    if len(sys.argv) > 1:
+        numOutstanding = int(sys.argv[1])
+    (addTime, removeTime, minTime) = benchmarkMissingIDs(IntervalSet(), numOutstanding)
+    print("IntervalSet with " + str(numOutstanding) + " outstanding IDs")
+    print("  add batch (s): " + str(addTime))
+    print("  test+remove (us/op): " + str(removeTime * 1e6))
+    print("  min (us): " + str(minTime * 1e6))
+    # Worst case for the interval count, one interval per outstanding ID
+    (addTime, removeTime, minTime) = benchmarkMissingIDs(IntervalSet(), numOutstanding, fragmented=True)
+    print("IntervalSet with " + str(numOutstanding) + " outstanding IDs, every other ID arrived")
+    print("  add batch (s): " + str(addTime))
+    print("  test+remove (us/op): " + str(removeTime * 1e6))
+    print("  min (us): " + str(minTime * 1e6))
+    # The old list is quadratic so only give it a small number of operations
+    (addTime, removeTime, minTime) = benchmarkMissingIDs([], numOutstanding, numOps=100)
+    print("list with " + str(numOutstanding) + " outstanding IDs")
+    print("  add batch (s): " + str(addTime))
+    print("  test+remove (us/op): " + str(removeTime * 1e6))
+    print("  min (us): " + str(minTime * 1e6))
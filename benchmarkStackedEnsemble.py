@@ -0,0 +1,34 @@
+import sys
+import time
+import numpy as np
+from benchmarkBatchedInference import getPytorchModel
+
+def benchmarkProcess(model, inputs, numCalls, stackedInference):
+    # Returns rows per second through Model.process
+    model.stacked_inference = stackedInference
+    startTime = time.perf_counter()
+    for i in range(numCalls):
+        model.process(inputs, perform_column_extraction=False)
+    return numCalls * len(inputs) / (time.perf_counter() - startTime)
+
+if __name__ == "__main__":
+    maxBatch = 100000
+    if len(sys.argv) > 1:
+        maxBatch = int(sys.argv[1])
+    rng = np.random.default_rng(42)
+    # Same members either way, the stacked path just packs them into batched tensors
+    model = getPytorchModel(rng).model
+    batchSize = 1
+    while batchSize <= maxBatch:
+        inputs = rng.uniform(size=(batchSize, 9))
+        model.stacked_inference = False
+        (loopMean, loopStd) = model.process(inputs, perform_column_extraction=False)
+        model.stacked_inference = True
+        (stackedMean, stackedStd) = model.process(inputs, perform_column_extraction=False)
+        assert np.allclose(loopMean, stackedMean, rtol=1e-12, atol=1e-12)
+        assert np.allclose(loopStd, stackedStd, rtol=1e-9, atol=1e-15)
+        numCalls = max(1, 10000 // batchSize)
+        loopRate = benchmarkProcess(model, inputs, numCalls, False)
+        stackedRate = benchmarkProcess(model, inputs, numCalls, True)
+        print("batch size " + str(batchSize) + " rows/s loop: " + str(loopRate) + " stacked: " + str(stackedRate) + " speedup: " + str(stackedRate / loopRate))
+        batchSize *= 10
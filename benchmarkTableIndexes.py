@@ -0,0 +1,62 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import numpy as np
+from glueCodeTypes import SolverCode
+from initTables import getSQLTableStrings, getSQLIndexStrings
+
+def fillTables(sqlDB, numRows, numRanks):
+    # Rows look like one tag of a campaign with requests spread over ranks
+    resRows = []
+    reqRows = []
+    for i in range(numRows):
+        rank = i % numRanks
+        reqid = i // numRanks
+        reqRows.append(("BENCH", rank, reqid) + (1.0,) * 9 + (0,))
+        resRows.append(("BENCH", rank, reqid) + (1.0,) * 12 + (0,))
+    sqlDB.executemany("INSERT INTO BGKREQS VALUES(" + ", ".join(["?"] * 13) + ");", reqRows)
+    sqlDB.executemany("INSERT INTO BGKRESULTS VALUES(" + ", ".join(["?"] * 16) + ");", resRows)
+    sqlDB.commit()
+
+def timeQuery(sqlDB, query, argList):
+    startTime = time.perf_counter()
+    for args in argList:
+        sqlDB.execute(query, args).fetchall()
+    return (time.perf_counter() - startTime) / len(argList)
+
+def benchmarkPolls(numRows, useIndexes, numRanks=64, numPolls=200):
+    with tempfile.TemporaryDirectory() as tmpDir:
+        sqlDB = sqlite3.connect(os.path.join(tmpDir, "bench.db"))
+        (dropStrings, createStrings) = getSQLTableStrings(SolverCode.BGK)
+        for createString in createStrings:
+            sqlDB.execute(createString)
+        fillTables(sqlDB, numRows, numRanks)
+        if useIndexes:
+            for indexString in getSQLIndexStrings(SolverCode.BGK):
+                sqlDB.execute(indexString)
+            sqlDB.execute("ANALYZE;")
+            sqlDB.commit()
+        maxReq = max(numRows // numRanks, 1)
+        rng = np.random.default_rng(42)
+        ranks = rng.integers(0, numRanks, numPolls).tolist()
+        reqs = rng.integers(0, maxReq, numPolls).tolist()
+        # What the requester in alInterface.hpp issues while waiting on a result
+        resQuery = "SELECT * FROM BGKRESULTS WHERE REQ=? AND TAG=? AND RANK=?;"
+        resTime = timeQuery(sqlDB, resQuery, [(r, "BENCH", k) for (r, k) in zip(reqs, ranks)])
+        # What getSelString generates for a caught up rank
+        reqQuery = "SELECT * FROM BGKREQS WHERE RANK=? AND REQ>=? AND TAG=?;"
+        reqTime = timeQuery(sqlDB, reqQuery, [(k, maxReq, "BENCH") for k in ranks])
+        sqlDB.close()
+        return (resTime, reqTime)
+
+if __name__ == "__main__":
+    tableSizes = [1000, 10000, 100000, 1000000]
+    if len(sys.argv) > 1:
+        tableSizes = [int(arg) for arg in sys.argv[1:]]
+    print("#Rows ResultPollNoIndex(us) ResultPollIndexed(us) ReqPollNoIndex(us) ReqPollIndexed(us)")
+    for numRows in tableSizes:
+        (resNoIdx, reqNoIdx) = benchmarkPolls(numRows, False)
+        (resIdx, reqIdx) = benchmarkPolls(numRows, True)
+        print(numRows, resNoIdx * 1e6, resIdx * 1e6, reqNoIdx * 1e6, reqIdx * 1e6)
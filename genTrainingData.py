@@ -1,35 +1,48 @@
 import numpy as np
 import os
 from glueCodeTypes import ALInterfaceMode, SolverCode, BGKInputs, BGKMassesInputs
-from alInterface import  getAllGNDData, queueFGSJob
+from alInterface import  getAllGNDData, queueFGSJobs, ResultWriter, FGSJobQueue, writeFailedFGSResults
 import getpass
 from alDBHandlers import getDBHandle
 from glueArgParser import processGlueCodeArguments
+from glueGNDCache import getGNDCache
 
 def genTrainingData(configStruct, uname, dbHandle):
     code = configStruct['solverCode']
     reqid = 0
     pythonScriptDir = os.path.dirname(os.path.realpath(__file__))
     trainingDir = os.path.join(pythonScriptDir, "training")
-    dbCache = []
+    dbCache = getGNDCache(configStruct)
     fgDBSettings = configStruct['DatabaseSettings']['FineGrainDB']
     fgDB = getDBHandle(fgDBSettings)
+    batchSettings = {}
+    if 'ResultBatching' in configStruct:
+        batchSettings = configStruct['ResultBatching']
+    resultWriter = ResultWriter(dbHandle, code, batchSettings)
+    fgsQueue = FGSJobQueue(configStruct, uname)
+    fgsTasks = []
     if code == SolverCode.BGK:
         csv = os.path.join(trainingDir, "bgk.csv")
         trainingEntries = np.loadtxt(csv)
         for row in trainingEntries:
             inArgs = BGKInputs(Temperature=row[0], Density=[row[1], row[2], 0.0, 0.0], Charges=[row[3], row[4], 0.0, 0.0])
-            queueFGSJob(configStruct, uname, reqid, inArgs, 0, ALInterfaceMode.FGS, dbHandle, fgDB, dbCache)
+            fgsTasks.append((0, reqid, ALInterfaceMode.FGS, inArgs))
             reqid += 1
     elif code == SolverCode.BGKMASSES:
         csv = os.path.join(trainingDir, "bgk_masses.csv")
         trainingEntries = np.loadtxt(csv)
         for row in trainingEntries:
             inArgs = BGKMassesInputs(Temperature=row[0], Density=[row[1], row[2], 0.0, 0.0], Charges=[row[3], row[4], 0.0, 0.0], Masses=[row[5], row[6], 0.0, 0.0])
-            queueFGSJob(configStruct, uname, reqid, inArgs, 0, ALInterfaceMode.FGS, dbHandle, fgDB, dbCache)
+            fgsTasks.append((0, reqid, ALInterfaceMode.FGS, inArgs))
             reqid += 1
     else:
         raise Exception('Using Unsupported Solver Code')
+    # Look up every training point against ground truth at once
+    queueFGSJobs(configStruct, uname, fgsTasks, resultWriter, fgsQueue, fgDB, dbCache)
+    fgsQueue.drain(block=True)
+    writeFailedFGSResults(configStruct, fgsQueue, resultWriter)
+    resultWriter.flush()
+    fgsQueue.close()
 
 
 def printResults(gndTable, code):
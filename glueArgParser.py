@@ -1,7 +1,7 @@
 import argparse
 import json
 import getpass
-from glueCodeTypes import ALInterfaceMode, SolverCode, LearnerBackend, SchedulerInterface, ProvisioningInterface, DatabaseMode
+from glueCodeTypes import ALInterfaceMode, SolverCode, LearnerBackend, SchedulerInterface, ProvisioningInterface, DatabaseMode, IngestionMode, IdleStrategy, CacheEvictionPolicy
 
 def processGlueCodeArguments():
     defaultFName = "testDB.db"
@@ -42,6 +42,12 @@ def processGlueCodeArguments():
         configStruct['ProvisioningInterface'] = ProvisioningInterface(configStruct['ProvisioningInterface'])
     if 'SchedulerInterface' in configStruct:
         configStruct['SchedulerInterface'] = SchedulerInterface(configStruct['SchedulerInterface'])
+    if 'IngestionMode' in configStruct:
+        configStruct['IngestionMode'] = IngestionMode(configStruct['IngestionMode'])
+    if 'IdleSettings' in configStruct and 'IdleStrategy' in configStruct['IdleSettings']:
+        configStruct['IdleSettings']['IdleStrategy'] = IdleStrategy(configStruct['IdleSettings']['IdleStrategy'])
+    if 'GNDCacheSettings' in configStruct and 'EvictionPolicy' in configStruct['GNDCacheSettings']:
+        configStruct['GNDCacheSettings']['EvictionPolicy'] = CacheEvictionPolicy(configStruct['GNDCacheSettings']['EvictionPolicy'])
     configStruct['DatabaseSettings']['CoarseGrainDB']['DatabaseMode'] = \
         DatabaseMode(
             configStruct['DatabaseSettings']['CoarseGrainDB']['DatabaseMode']
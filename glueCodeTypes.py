@@ -43,6 +43,19 @@ class DatabaseMode(IntEnum):
     MYSQL = 1
     HDF5 = 2
 
+class IngestionMode(IntEnum):
+    PERRANK = 0
+    BATCHED = 1
+
+class IdleStrategy(IntEnum):
+    SPIN = 0
+    BACKOFF = 1
+    DATAVERSION = 2
+
+class CacheEvictionPolicy(IntEnum):
+    LRU = 0
+    LFU = 1
+
 # BGKInputs
 #  Temperature: float
 #  Density: float[4]
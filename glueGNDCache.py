@@ -0,0 +1,168 @@
+import math
+import sys
+import collections
+import numpy as np
+from glueCodeTypes import BGKInputs, BGKOutputs, CacheEvictionPolicy
+
+class GNDCache:
+    """Bounded in memory cache of ground truth DB hits
+
+    Inputs are kept in a preallocated array and bucketed on a log scale
+    grid over temperature and the first density. A lookup only checks the
+    neighbouring grid cells, then checks relative error against every
+    candidate at once. When full, the least recently used entry is evicted
+    from an OrderedDict, or the least frequently used one from per use
+    count buckets, oldest first among ties"""
+    def __init__(self, relError, maxEntries=100000, evictionPolicy=CacheEvictionPolicy.LRU):
+        self.relError = relError
+        self.maxEntries = maxEntries
+        self.evictionPolicy = evictionPolicy
+        # Widest log space distance two values within relError of each other can be apart
+        self.cellWidth = -math.log(1.0 - relError) if relError < 1.0 else math.inf
+        self.inputs = np.zeros((maxEntries, 9))
+        self.outputs = [None] * maxEntries
+        self.cells = [None] * maxEntries
+        self.useCount = np.zeros(maxEntries, dtype=np.int64)
+        # LRU: slots from least to most recently used
+        self.recency = collections.OrderedDict()
+        # LFU: map of use count to its slots from least to most recently used, and the smallest count
+        self.frequency = {}
+        self.minCount = 0
+        self.grid = {}
+        self.freeSlots = list(range(maxEntries - 1, -1, -1))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    def __len__(self):
+        return self.maxEntries - len(self.freeSlots)
+    def packInputs(self, inArgs):
+        return np.concatenate([[inArgs.Temperature], inArgs.Density, inArgs.Charges])
+    def getCellIndex(self, value):
+        # Zero means the species is absent, so it gets its own cell
+        if value == 0.0:
+            return None
+        if math.isinf(self.cellWidth):
+            return 0
+        if self.cellWidth == 0.0:
+            # Nothing is within a zero relError, so any cell will do
+            return value
+        return math.floor(math.log(abs(value)) / self.cellWidth)
+    def getCell(self, packedInput):
+        return (self.getCellIndex(packedInput[0]), self.getCellIndex(packedInput[1]))
+    def getNeighbourCells(self, cell):
+        neighbours = [[index] if index is None else [index - 1, index, index + 1] for index in cell]
+        return [(t, d) for t in neighbours[0] for d in neighbours[1]]
+    def lookup(self, inArgs):
+        # Returns the cached outputs closest to inArgs within relError, otherwise None
+        if not isinstance(inArgs, BGKInputs):
+            return None
+        packedInput = self.packInputs(inArgs)
+        slots = []
+        for cell in self.getNeighbourCells(self.getCell(packedInput)):
+            slots.extend(self.grid.get(cell, []))
+        if len(slots) == 0:
+            self.misses += 1
+            return None
+        slots = np.array(slots)
+        candidates = self.inputs[slots]
+        # Absolute relative difference against the cached value, zeros only match zeros
+        isZero = candidates == 0.0
+        relDiff = np.abs(packedInput - candidates) / np.abs(np.where(isZero, 1.0, candidates))
+        relDiff = np.where(isZero, np.where(packedInput == 0.0, 0.0, np.inf), relDiff)
+        maxRelDiff = relDiff.max(axis=1)
+        best = np.argmin(maxRelDiff)
+        # Strictly within relError, as the ground truth DB query checks
+        if not maxRelDiff[best] < self.relError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        slot = int(slots[best])
+        self.touch(slot)
+        return self.outputs[slot]
+    def touch(self, slot):
+        if self.evictionPolicy == CacheEvictionPolicy.LFU:
+            count = int(self.useCount[slot])
+            self.removeFromBucket(slot, count)
+            if self.minCount == count and count not in self.frequency:
+                self.minCount = count + 1
+            self.useCount[slot] = count + 1
+            self.frequency.setdefault(count + 1, collections.OrderedDict())[slot] = None
+        else:
+            self.recency.move_to_end(slot)
+    def removeFromBucket(self, slot, count):
+        bucket = self.frequency[count]
+        del bucket[slot]
+        if len(bucket) == 0:
+            del self.frequency[count]
+    def insert(self, inArgs, outputs):
+        # Returns the slot the entry was stored in, or None if it was not cached
+        if not isinstance(inArgs, BGKInputs) or self.maxEntries == 0:
+            return None
+        if len(self.freeSlots) == 0:
+            self.evict()
+        slot = self.freeSlots.pop()
+        packedInput = self.packInputs(inArgs)
+        cell = self.getCell(packedInput)
+        self.inputs[slot] = packedInput
+        self.outputs[slot] = outputs
+        self.cells[slot] = cell
+        if self.evictionPolicy == CacheEvictionPolicy.LFU:
+            self.useCount[slot] = 1
+            self.frequency.setdefault(1, collections.OrderedDict())[slot] = None
+            self.minCount = 1
+        else:
+            self.recency[slot] = None
+        self.grid.setdefault(cell, []).append(slot)
+        return slot
+    def remove(self, slot):
+        cell = self.cells[slot]
+        self.grid[cell].remove(slot)
+        if len(self.grid[cell]) == 0:
+            del self.grid[cell]
+        if self.evictionPolicy == CacheEvictionPolicy.LFU:
+            # minCount may now be stale, evict catches that up
+            self.removeFromBucket(slot, int(self.useCount[slot]))
+        else:
+            del self.recency[slot]
+        self.outputs[slot] = None
+        self.cells[slot] = None
+        self.freeSlots.append(slot)
+    def evict(self):
+        # Only called when full, so there is always an entry to evict
+        if self.evictionPolicy == CacheEvictionPolicy.LFU:
+            if self.minCount not in self.frequency:
+                self.minCount = min(self.frequency)
+            slot = next(iter(self.frequency[self.minCount]))
+        else:
+            slot = next(iter(self.recency))
+        self.remove(slot)
+        self.evictions += 1
+    def getStats(self):
+        return (self.hits, self.misses, self.evictions)
+
+def getDeepSize(obj):
+    # Bytes held by obj and the containers and numbers inside it
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (tuple, list)):
+        size += sum(getDeepSize(item) for item in obj)
+    return size
+
+def getGNDCacheEntryBytes():
+    # Estimated bytes per cache entry: its input row, use count, slot references, grid cell and outputs
+    slotBytes = 9 * 8 + 8 + 4 * 8 + getDeepSize((0, 0))
+    return slotBytes + getDeepSize(BGKOutputs(Viscosity=0.0, ThermalConductivity=0.0, DiffCoeff=[0.0]*10))
+
+def getGNDCache(configStruct):
+    cacheSettings = {}
+    if 'GNDCacheSettings' in configStruct:
+        cacheSettings = configStruct['GNDCacheSettings']
+    # Configs that never look up ground truth may leave out ICFParameters
+    relError = 0.0
+    if 'ICFParameters' in configStruct:
+        relError = configStruct['ICFParameters']['RelativeError']
+    maxBytes = cacheSettings.get('MaxMemoryMB', 64.0) * 1024 * 1024
+    return GNDCache(
+        relError,
+        int(maxBytes // getGNDCacheEntryBytes()),
+        cacheSettings.get('EvictionPolicy', CacheEvictionPolicy.LRU)
+    )
@@ -0,0 +1,76 @@
+from sortedcontainers import SortedList
+
+class IntervalSet:
+    """Set of integers stored as sorted, disjoint, half open intervals
+
+    Used to track missing request IDs per rank. Interval starts are kept
+    in a SortedList with each end looked up from a dict, so testing,
+    removing, and adding a value are O(log n) in the number of intervals
+    even once out of order arrivals have fragmented the set. Adding a
+    range is O(log n) per interval it absorbs"""
+    def __init__(self):
+        # Interval [start, ends[start]) for each start; neighbours never touch
+        self.starts = SortedList()
+        self.ends = {}
+        self.count = 0
+    def __len__(self):
+        return self.count
+    def findInterval(self, value):
+        # Returns the start of the interval holding value, otherwise None
+        i = self.starts.bisect_right(value) - 1
+        if i < 0:
+            return None
+        start = self.starts[i]
+        if value >= self.ends[start]:
+            return None
+        return start
+    def __contains__(self, value):
+        return self.findInterval(value) is not None
+    def __iter__(self):
+        for start in self.starts:
+            yield from range(start, self.ends[start])
+    def addRange(self, start, end):
+        # Adds every integer in [start, end)
+        if start >= end:
+            return
+        # Intervals overlapping or touching [start, end) start at or before end and end at or after start
+        i = max(self.starts.bisect_right(start) - 1, 0)
+        absorbed = []
+        for otherStart in self.starts.islice(i):
+            if otherStart > end:
+                break
+            if self.ends[otherStart] >= start:
+                absorbed.append(otherStart)
+        for otherStart in absorbed:
+            otherEnd = self.ends.pop(otherStart)
+            self.starts.remove(otherStart)
+            self.count -= otherEnd - otherStart
+            start = min(start, otherStart)
+            end = max(end, otherEnd)
+        self.starts.add(start)
+        self.ends[start] = end
+        self.count += end - start
+    def add(self, value):
+        self.addRange(value, value + 1)
+    def remove(self, value):
+        start = self.findInterval(value)
+        if start is None:
+            raise KeyError(value)
+        end = self.ends[start]
+        if value == start:
+            self.starts.remove(start)
+            del self.ends[start]
+            if end - start > 1:
+                self.starts.add(value + 1)
+                self.ends[value + 1] = end
+        else:
+            # Keep [start, value) and split off anything past value
+            self.ends[start] = value
+            if value + 1 < end:
+                self.starts.add(value + 1)
+                self.ends[value + 1] = end
+        self.count -= 1
+    def min(self):
+        if self.count == 0:
+            raise ValueError('min() of empty IntervalSet')
+        return self.starts[0]
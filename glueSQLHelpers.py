@@ -1,3 +1,5 @@
+from glueCodeTypes import SolverCode
+
 def getSQLArrGenString(fName, dType, length):
     tString = ""
     if dType == int:
@@ -10,3 +12,17 @@ def getSQLArrGenString(fName, dType, length):
     for i in range(length):
         retStr += fName + "_" + str(i) + " " + tString + ", "
     return retStr
+
+def getGNDInputColumns(packetType):
+    if packetType == SolverCode.BGK:
+        return ["TEMPERATURE"] + ["DENSITY_" + str(i) for i in range(4)] + ["CHARGES_" + str(i) for i in range(4)]
+    else:
+        raise Exception('Using Unsupported Solver Code')
+
+def getGNDRTreeColumns(packetType):
+    # R*Trees cap out at 5 dimensions and split badly along an axis that never varies,
+    #  so skip the trace species whose densities and charges are usually all zero
+    if packetType == SolverCode.BGK:
+        return ["TEMPERATURE", "DENSITY_0", "DENSITY_1", "CHARGES_0", "CHARGES_1"]
+    else:
+        raise Exception('Using Unsupported Solver Code')
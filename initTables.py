@@ -1,26 +1,16 @@
 from glueCodeTypes import SolverCode
 from glueArgParser import processGlueCodeArguments
-from glueSQLHelpers import getSQLArrGenString
+from glueSQLHelpers import getSQLArrGenString, getGNDRTreeColumns
 from alDBHandlers import getDBHandle
 
-
-def initSQLTables(configStruct):
-    dbHandles = []
-    cgDBSettings = configStruct['DatabaseSettings']['CoarseGrainDB']
-    cgDB = getDBHandle(cgDBSettings, True)
-    dbHandles.append(cgDB)
-    fgDBSettings = configStruct['DatabaseSettings']['FineGrainDB']
-    fgDB = getDBHandle(fgDBSettings)
-    dbHandles.append(fgDB)
-    packetType = configStruct['solverCode']
-    reqString = ""
-    resString = ""
-    resFString = ""
-    gndString = ""
+def getSQLTableStrings(packetType):
+    # Returns (drop strings, create strings) for every table of the solver code
+    dropStrings = []
+    createStrings = []
     if packetType == SolverCode.BGK:
-        dropReqString = "DROP TABLE IF EXISTS BGKREQS;"
-        dropResString = "DROP TABLE IF EXISTS BGKRESULTS;"
-        dropResFString = "DROP TABLE IF EXISTS BGKFASTRESULTS;"
+        dropStrings.append("DROP TABLE IF EXISTS BGKREQS;")
+        dropStrings.append("DROP TABLE IF EXISTS BGKRESULTS;")
+        dropStrings.append("DROP TABLE IF EXISTS BGKFASTRESULTS;")
         reqString = "CREATE TABLE BGKREQS(TAG TEXT NOT NULL, RANK INT NOT NULL, REQ INT NOT NULL, TEMPERATURE REAL, "
         reqString += getSQLArrGenString("DENSITY", float, 4)
         reqString += getSQLArrGenString("CHARGES", float, 4)
@@ -43,25 +33,85 @@ def initSQLTables(configStruct):
         logString += "INVERSION REAL, VISCOSITY REAL, THERMAL_CONDUCT REAL, "
         logString += getSQLArrGenString("DIFFCOEFF", float, 10)
         logString += "OUTVERSION REAL);"
+        createStrings += [reqString, resString, gndString, logString, resFString]
     else:
         raise Exception('Using Unsupported Solver Code')
+    return (dropStrings, createStrings)
+
+def getSQLIndexStrings(packetType):
+    # IF NOT EXISTS so these double as the migration for existing DB files
+    # Tables keep their ROWID as batched ingestion and result syncing use it as a watermark
+    indexStrings = []
+    if packetType == SolverCode.BGK:
+        # Requester polls and glue scans are all WHERE TAG=? AND RANK=? AND REQ...
+        indexStrings.append("CREATE INDEX IF NOT EXISTS BGKREQS_TAG_RANK_REQ ON BGKREQS(TAG, RANK, REQ);")
+        indexStrings.append("CREATE INDEX IF NOT EXISTS BGKRESULTS_TAG_RANK_REQ ON BGKRESULTS(TAG, RANK, REQ);")
+        indexStrings.append("CREATE INDEX IF NOT EXISTS BGKFASTRESULTS_TAG_RANK_REQ ON BGKFASTRESULTS(TAG, RANK, REQ);")
+        # Ground truth lookups filter on version and then on a temperature window
+        indexStrings.append("CREATE INDEX IF NOT EXISTS BGKGND_INVERSION_TEMPERATURE ON BGKGND(INVERSION, TEMPERATURE);")
+        # Relative error lookups are boxes around the request, the remaining inputs are left to the exact check
+        rtreeColumns = getGNDRTreeColumns(packetType)
+        rtreeString = "CREATE VIRTUAL TABLE IF NOT EXISTS BGKGND_RTREE USING rtree(ID, "
+        rtreeString += ", ".join(["MIN_" + col + ", MAX_" + col for col in rtreeColumns])
+        rtreeString += ");"
+        indexStrings.append(rtreeString)
+        # Rows are points so each column is both the min and the max of its box
+        pointString = ", ".join([col + ", " + col for col in rtreeColumns])
+        newPointString = ", ".join(["NEW." + col + ", NEW." + col for col in rtreeColumns])
+        # Backfill anything inserted before the R*Tree existed
+        indexStrings.append("INSERT INTO BGKGND_RTREE SELECT ROWID, " + pointString + " FROM BGKGND WHERE ROWID NOT IN (SELECT ID FROM BGKGND_RTREE);")
+        # And keep it in sync with every writer of BGKGND
+        indexStrings.append("CREATE TRIGGER IF NOT EXISTS BGKGND_RTREE_INSERT AFTER INSERT ON BGKGND BEGIN INSERT INTO BGKGND_RTREE VALUES(NEW.ROWID, " + newPointString + "); END;")
+        indexStrings.append("CREATE TRIGGER IF NOT EXISTS BGKGND_RTREE_DELETE AFTER DELETE ON BGKGND BEGIN DELETE FROM BGKGND_RTREE WHERE ID=OLD.ROWID; END;")
+    else:
+        raise Exception('Using Unsupported Solver Code')
+    return indexStrings
+
+def getDBHandles(configStruct):
+    dbHandles = []
+    cgDBSettings = configStruct['DatabaseSettings']['CoarseGrainDB']
+    cgDB = getDBHandle(cgDBSettings, True)
+    dbHandles.append(cgDB)
+    fgDBSettings = configStruct['DatabaseSettings']['FineGrainDB']
+    fgDB = getDBHandle(fgDBSettings)
+    dbHandles.append(fgDB)
+    return dbHandles
+
+def createSQLIndexes(packetType, db):
+    db.openCursor()
+    for indexString in getSQLIndexStrings(packetType):
+        db.execute(indexString)
+    # Refresh planner statistics so the new indexes are actually chosen
+    db.execute("ANALYZE;")
+    db.commit()
+    db.closeCursor()
+
+def initSQLTables(configStruct):
+    dbHandles = getDBHandles(configStruct)
+    packetType = configStruct['solverCode']
+    (dropStrings, createStrings) = getSQLTableStrings(packetType)
 
     for db in dbHandles:
         db.openCursor()
 
-        db.execute(dropReqString)
-        db.execute(dropResString)
-        db.execute(dropResFString)
+        for dropString in dropStrings:
+            db.execute(dropString)
         db.commit()
 
-        db.execute(reqString)
-        db.execute(resString)
-        db.execute(gndString)
-        db.execute(logString)
-        db.execute(resFString)
+        for createString in createStrings:
+            db.execute(createString)
 
         db.commit()
         db.closeCursor()
+        createSQLIndexes(packetType, db)
+        db.closeDB()
+
+def migrateSQLTables(configStruct):
+    # Adds indexes to DB files created before initSQLTables generated them
+    dbHandles = getDBHandles(configStruct)
+    packetType = configStruct['solverCode']
+    for db in dbHandles:
+        createSQLIndexes(packetType, db)
         db.closeDB()
 
 if __name__ == "__main__":
@@ -0,0 +1,8 @@
+from glueArgParser import processGlueCodeArguments
+from initTables import migrateSQLTables
+
+if __name__ == "__main__":
+    # Adds indexes to existing DB files without dropping any data
+    configStruct = processGlueCodeArguments()
+
+    migrateSQLTables(configStruct)
@@ -0,0 +1,161 @@
+import struct
+import zipfile
+
+import numpy as np
+# Built with numpy '1.16.3'
+
+from glueCodeTypes import SolverCode, BGKOutputs
+
+# Torch free evaluation of ensembles exported by nn_learner.export_npz
+
+
+ACTIVATIONS = dict(
+    relu = lambda x: np.maximum(x,0),
+    tanh = np.tanh,
+    sigmoid = lambda x: 1/(1+np.exp(-x)),
+)
+
+
+def load_npz_mmap(path):
+    """
+    Memory map every array of an uncompressed .npz file.
+    np.load ignores mmap_mode for .npz archives, so each member is mapped at its offset in the zip.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path,'rb') as raw:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise Exception('Cannot memory map compressed model artifact')
+            # Skip the local file header to reach the .npy data
+            raw.seek(info.header_offset)
+            name_len,extra_len = struct.unpack("<HH",raw.read(30)[26:30])
+            raw.seek(info.header_offset+30+name_len+extra_len)
+            version = np.lib.format.read_magic(raw)
+            if version == (1,0):
+                shape,fortran_order,dtype = np.lib.format.read_array_header_1_0(raw)
+            else:
+                shape,fortran_order,dtype = np.lib.format.read_array_header_2_0(raw)
+            order = 'F' if fortran_order else 'C'
+            arrays[info.filename[:-len(".npy")]] = np.memmap(path,dtype=dtype,mode='r',offset=raw.tell(),shape=shape,order=order)
+    return arrays
+
+
+class Model():
+    """
+    Ensemble model evaluated with numpy only. Error bar is std. dev. of networks.
+    Same interface as nn_learner.Model.
+    """
+    def __init__(self,arrays):
+        self.err_info = np.array(arrays["err_info"])
+        self.solver = SolverCode(int(arrays["solver"][0]))
+        self.n_data = int(arrays["n_data"][0])
+        self.input_slice = slice(int(arrays["input_slice"][0]),int(arrays["input_slice"][1]))
+        self.n_members = 0
+        self.layers = []
+        for i,layer_type in enumerate(arrays["layer_types"]):
+            layer_type = str(layer_type)
+            if layer_type == "scaler":
+                self.layers.append((layer_type,arrays["means_{}".format(i)][:,np.newaxis,:],arrays["stds_{}".format(i)][:,np.newaxis,:]))
+            elif layer_type == "linear":
+                self.n_members = arrays["weights_{}".format(i)].shape[0]
+                self.layers.append((layer_type,arrays["weights_{}".format(i)],arrays["biases_{}".format(i)][:,np.newaxis,:]))
+            else:
+                self.layers.append((layer_type,ACTIVATIONS[layer_type]))
+
+    def __call__(self,request_params):
+        """
+        :param request_params: BGKInputs
+        :return: result[3], errbar[3]
+        """
+        request_params = self.pack_inputs(request_params)
+
+        result_mean,result_error = self.process(request_params)
+
+        result_mean = self.unpack_outputs(result_mean)
+        result_error = self.unpack_outputs(result_error)
+        return result_mean,result_error
+
+    def process(self,request_params,perform_column_extraction=True): #as a numpy array
+        batched = request_params.ndim>1
+
+        request_params = np.asarray(request_params,dtype=np.float64)
+        if perform_column_extraction:
+            request_params = request_params[...,self.input_slice]
+
+        if not batched:
+            request_params = request_params[np.newaxis]
+
+        # Every member at once: (members, batch, features)
+        x = np.broadcast_to(request_params,(self.n_members,)+request_params.shape)
+        for layer in self.layers:
+            if layer[0] == "scaler":
+                x = (x.astype(layer[1].dtype,copy=False)-layer[1])/layer[2]
+            elif layer[0] == "linear":
+                # Weights may be stored at reduced precision
+                x = np.matmul(x.astype(layer[1].dtype,copy=False),layer[1])+layer[2]
+            else:
+                x = layer[1](x)
+
+        mean = x.mean(axis=0)
+        std = x.std(axis=0)
+
+        if not batched:
+            mean = mean[0]
+            std = std[0]
+
+        return mean, std
+
+    def process_iserrok_fuzzy(self,errbars):
+        return errbars/self.err_info
+
+    def process_iserrok(self,errbars):
+        return errbars < self.err_info
+
+    def iserrok(self,errbars):
+        errbars = self.pack_outputs(errbars)
+        iserrok = self.process_iserrok(errbars)
+        iserrok = self.unpack_outputs(iserrok)
+        return iserrok
+
+    def iserrok_fuzzy(self,errbars):
+        errbars = self.pack_outputs(errbars)
+        iserrok = self.process_iserrok_fuzzy(errbars)
+        iserrok = self.unpack_outputs(iserrok)
+        return iserrok
+
+    def pack_outputs(self,request):
+        return NotImplemented
+
+    def pack_inputs(self,request):
+        return NotImplemented
+
+    def unpack_outputs(self,result):
+        return NotImplemented
+
+
+class BGKModel(Model):
+    def pack_inputs(self,request):
+        packed_request = np.concatenate([[request.Temperature],request.Density,request.Charges])
+        return packed_request
+
+    def unpack_outputs(self,packed_result):
+        v = packed_result[0]
+        tc = packed_result[1]
+        diff = packed_result[2:]
+        unpacked_result = BGKOutputs(v,tc,diff)
+        return unpacked_result
+
+    def pack_outputs(self,outputs):
+        output_vals = np.concatenate([[outputs.Viscosity], [outputs.ThermalConductivity], outputs.DiffCoeff])
+        return output_vals
+
+
+MODEL_TYPES = {
+    SolverCode.BGK:BGKModel,
+}
+
+
+def load_model(path):
+    arrays = load_npz_mmap(path)
+    solver = SolverCode(int(arrays["solver"][0]))
+    return MODEL_TYPES[solver](arrays)
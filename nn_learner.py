@@ -1,5 +1,7 @@
 import copy
 import warnings
+import multiprocessing
+import concurrent.futures
 
 import numpy as np
 # Built with numpy '1.16.3'
@@ -21,10 +23,45 @@ class Model():
     """
     Ensemble model. Error bar is std. dev. of networks.
     """
-    def __init__(self,solver,networks,err_info=None):
+    def __init__(self,solver,networks,err_info=None,n_data=None,stacked_inference=False):
         self.networks = networks
         self.err_info = err_info
         self.solver = solver
+        # Number of GND rows the model was trained on, incremental retrains treat the rest as new
+        self.n_data = n_data
+        # Run every member at once through a StackedEnsemble instead of one network at a time
+        self.stacked_inference = stacked_inference
+        self.stacked = None
+        # Networks are trained in float64, inference can run the hidden layers at lower precision
+        self.inference_dtype = torch.float64
+        self.inference_networks = None
+
+    def __getstate__(self):
+        # Cast and stacked copies of the weights are rebuilt on first use rather than pickled
+        state = self.__dict__.copy()
+        state["stacked"] = None
+        state["inference_networks"] = None
+        return state
+
+    def set_inference_dtype(self,dtype):
+        self.inference_dtype = dtype
+        self.inference_networks = None
+        self.stacked = None
+
+    def get_inference_networks(self):
+        dtype = getattr(self,"inference_dtype",torch.float64)
+        if dtype == torch.float64:
+            return self.networks
+        if getattr(self,"inference_networks",None) is None:
+            self.inference_networks = [cast_network(nn,dtype) for nn in self.networks]
+        return self.inference_networks
+
+    def get_stacked(self):
+        if not getattr(self,"stacked_inference",False):
+            return None
+        if getattr(self,"stacked",None) is None:
+            self.stacked = StackedEnsemble(self.get_inference_networks())
+        return self.stacked
 
     def __call__(self,request_params):
         """
@@ -50,7 +87,11 @@ class Model():
         if not batched:
             request_params = request_params.unsqueeze(0)
 
-        results = np.asarray([np.asarray(nn(request_params)) for nn in self.networks])
+        stacked = self.get_stacked()
+        if stacked is not None:
+            results = stacked(request_params).numpy()
+        else:
+            results = np.asarray([np.asarray(nn(request_params)) for nn in self.get_inference_networks()])
 
         mean = results.mean(axis=0)
         std = results.std(axis=0)
@@ -117,6 +158,119 @@ class Model():
         return NotImplemented
 
 
+class Cast(torch.nn.Module):
+    def __init__(self,dtype):
+        super().__init__()
+        self.dtype = dtype
+
+    def forward(self,tensor):
+        return tensor.to(self.dtype)
+
+
+def cast_network(network,dtype):
+    """
+    Copy of a trained network whose hidden layers run in dtype.
+    The input and output Scalers stay float64, so 1e24 scale densities are normalized before anything is rounded
+    and outputs are rescaled at full precision.
+    """
+    layers = [network[0],Cast(dtype)]
+    layers += [copy.deepcopy(module).to(dtype) for module in network[1:-1]]
+    layers += [Cast(torch.float64),network[-1]]
+    return torch.nn.Sequential(*layers)
+
+
+class StackedEnsemble():
+    """
+    Weights of all ensemble members packed into batched tensors.
+    Each layer is one batched operation over every member instead of one call per network.
+    """
+    def __init__(self,networks):
+        self.n_members = len(networks)
+        if any(len(nn) != len(networks[0]) for nn in networks):
+            raise Exception('Ensemble members differ in structure, cannot stack')
+        self.layers = []
+        for modules in zip(*networks):
+            first = modules[0]
+            if any(type(module) != type(first) for module in modules):
+                raise Exception('Ensemble members differ in structure, cannot stack')
+            if isinstance(first,Scaler):
+                means = torch.stack([module.means.detach() for module in modules]).unsqueeze(1)
+                stds = torch.stack([module.stds.detach() for module in modules]).unsqueeze(1)
+                self.layers.append(("scaler",means,stds+first.eps))
+            elif isinstance(first,torch.nn.Linear):
+                # (members, in, out) so a batched matmul matches x @ W.T
+                weights = torch.stack([module.weight.detach() for module in modules]).transpose(1,2).contiguous()
+                biases = torch.stack([module.bias.detach() for module in modules]).unsqueeze(1)
+                self.layers.append(("linear",weights,biases))
+            else:
+                # Parameter free elementwise activation, the same for every member
+                self.layers.append(("activation",first))
+
+    def __call__(self,request_params):
+        """
+        :param request_params: tensor[batch, n_inputs]
+        :return: tensor[members, batch, n_outputs]
+        """
+        with torch.no_grad():
+            x = request_params.unsqueeze(0).expand(self.n_members,*request_params.shape)
+            for layer in self.layers:
+                if layer[0] == "scaler":
+                    x = (x-layer[1])/layer[2]
+                elif layer[0] == "linear":
+                    x = torch.baddbmm(layer[2],x,layer[1])
+                else:
+                    x = layer[1](x)
+        return x
+
+
+#Activations nn_inference knows how to evaluate
+EXPORTED_ACTIVATIONS = {
+    torch.nn.ReLU:"relu",
+    torch.nn.Tanh:"tanh",
+    torch.nn.Sigmoid:"sigmoid",
+}
+
+
+def export_npz(model,file):
+    """
+    Write model as plain arrays so nn_inference can evaluate it without torch.
+    Layers are stacked across members and hidden layers keep the model's inference precision.
+    :param file: path or binary file object, written uncompressed so it can be memory mapped
+    """
+    networks = model.get_inference_networks()
+    if any(len(nn) != len(networks[0]) for nn in networks):
+        raise Exception('Ensemble members differ in structure, cannot export')
+    input_slice = SOLVER_INDEXES[model.solver]["input_slice"]
+    n_data = model.n_data if getattr(model,"n_data",None) is not None else -1
+    arrays = dict(
+        err_info=np.asarray(model.err_info,dtype=np.float64),
+        solver=np.array([int(model.solver)]),
+        n_data=np.array([n_data]),
+        input_slice=np.array([input_slice.start,input_slice.stop]),
+    )
+    layer_types = []
+    for modules in zip(*networks):
+        first = modules[0]
+        i = len(layer_types)
+        if isinstance(first,Cast):
+            # Implied by the dtype of the following layer's arrays
+            continue
+        elif isinstance(first,Scaler):
+            layer_types.append("scaler")
+            arrays["means_{}".format(i)] = np.stack([module.means.detach().numpy() for module in modules])
+            arrays["stds_{}".format(i)] = np.stack([(module.stds+module.eps).detach().numpy() for module in modules])
+        elif isinstance(first,torch.nn.Linear):
+            layer_types.append("linear")
+            arrays["weights_{}".format(i)] = np.stack([module.weight.detach().numpy().T for module in modules])
+            arrays["biases_{}".format(i)] = np.stack([module.bias.detach().numpy() for module in modules])
+        elif type(first) in EXPORTED_ACTIVATIONS:
+            layer_types.append(EXPORTED_ACTIVATIONS[type(first)])
+        else:
+            raise Exception('Cannot export layer type {}'.format(type(first).__name__))
+    arrays["layer_types"] = np.array(layer_types)
+    np.savez(file,**arrays)
+
+
 # # BGKInputs
 # #  Temperature: float
 # #  Density: float[4]
@@ -191,6 +345,11 @@ DEFAULT_ENSEMBLE_CONFIG = dict(
     test_fraction = 0.1,
     score_thresh = 0.7,
     max_model_tries = 200,
+    n_workers = 1,           # >1 trains candidates concurrently in a process pool
+    threads_per_worker = 1,  # torch threads in each pool process
+    # (epoch, slack): candidates with any test R^2 below score_thresh-slack at that epoch are dropped
+    rejection_schedule = ((50,0.4),(200,0.2),(800,0.05)),
+    stacked_inference = True,  # pack members into batched tensors for Model.process
 )
 
 
@@ -207,12 +366,30 @@ DEFAULT_TRAINING_CONFIG = dict(
     cost_type = torch.nn.MSELoss
 )
 
+#Parameters for warm starting from a previous model
+DEFAULT_INCREMENTAL_CONFIG = dict(
+    replay_ratio = 4,              # old points replayed per new point
+    max_new_fraction = 0.5,        # more new data than this -> full retrain
+    degradation_tolerance = 1.1,   # allowed growth in test rmse relative to the previous member
+    n_epochs = 200,
+    lr = 1e-4,
+    patience = 10,
+)
+
+#Parameters for the published model's inference
+DEFAULT_INFERENCE_CONFIG = dict(
+    dtype = torch.float64,  # precision of the hidden layers, torch.float32 to opt in to faster inference
+    tolerance = 0.01,       # max change in mean or std relative to err_info before falling back to float64
+)
+
 #Bundle of all learning-related parameters
 DEFAULT_LEARNING_CONFIG = dict(
     net_config = DEFAULT_NET_CONFIG,
     ensemble_config = DEFAULT_ENSEMBLE_CONFIG,
     solver_type = SolverCode.BGK,
     training_config = DEFAULT_TRAINING_CONFIG,
+    incremental_config = DEFAULT_INCREMENTAL_CONFIG,
+    inference_config = DEFAULT_INFERENCE_CONFIG,
 )
 
 def assemble_dataset(raw_dataset,solver_code):
@@ -226,10 +403,17 @@ def assemble_dataset(raw_dataset,solver_code):
     return torch.utils.data.TensorDataset(features,targets)
 
 #prototype, only covers ensemble uncertainties
-def retrain(db_handle,learning_config=DEFAULT_LEARNING_CONFIG):
+def retrain(db_handle,learning_config=DEFAULT_LEARNING_CONFIG,previous_model=None):
 
     solver = learning_config["solver_type"]
     raw_dataset = getAllGNDData(db_handle,solver)
+
+    if previous_model is not None:
+        full_model = retrain_incremental(raw_dataset,previous_model,learning_config)
+        if full_model is not None:
+            return full_model
+        print("Incremental retrain not possible, falling back to full retrain")
+
     full_dataset = assemble_dataset(raw_dataset,solver)
 
 
@@ -240,9 +424,30 @@ def retrain(db_handle,learning_config=DEFAULT_LEARNING_CONFIG):
     n_train = n_total-n_test
     print("Total / train / test points:",n_total,n_train,n_test)
 
+    if ensemble_config.get("n_workers",1) > 1:
+        networks,network_scores,network_errors,epoch_counts = train_members_parallel(full_dataset,n_train,n_test,learning_config)
+    else:
+        networks,network_scores,network_errors,epoch_counts = train_members_serial(full_dataset,n_train,n_test,learning_config)
+    report_epochs_saved(epoch_counts,learning_config["training_config"])
+
+    #print("scores",network_scores)
+    error_info = np.mean(np.asarray(network_errors),axis=0)
+
+    full_model = SOLVER_INDEXES[solver]["model_type"](solver, networks, error_info, n_data=n_total,
+                                                     stacked_inference=ensemble_config.get("stacked_inference",False))
+    full_model.calibrate(full_dataset)
+    set_inference_precision(full_model,full_dataset[:][0].numpy(),learning_config)
+
+    return full_model
+
+
+def train_members_serial(full_dataset,n_train,n_test,learning_config):
+    ensemble_config = learning_config["ensemble_config"]
+
     networks = []
     network_errors = []
     network_scores = []
+    epoch_counts = []
 
     successful_models = 0
     i=0
@@ -254,14 +459,12 @@ def retrain(db_handle,learning_config=DEFAULT_LEARNING_CONFIG):
         print("Good models found:",successful_models)
         print("Training ensemble member",i)
 
-        train_data, test_data = torch.utils.data.random_split(full_dataset, (n_train, n_test))
-
-
-        # This is a place where we could trivially parallelize training.
-
-        this_model = train_single_model(train_data, learning_config=learning_config)
-        model_score,model_errors = get_error_info(this_model,test_data)
+        this_model,model_score,model_errors,n_epochs = train_candidate(full_dataset,n_train,n_test,learning_config)
+        epoch_counts.append((n_epochs,this_model is None))
         print("Score:",model_score)
+        if this_model is None:
+            print("Rejected early at epoch",n_epochs)
+            continue
         if any(m < ensemble_config["score_thresh"] for m in model_score):
             print("Rejected.")
             continue
@@ -273,24 +476,201 @@ def retrain(db_handle,learning_config=DEFAULT_LEARNING_CONFIG):
         network_scores.append(model_score)
         network_errors.append(model_errors)
 
-    #print("scores",network_scores)
-    error_info = np.mean(np.asarray(network_errors),axis=0)
+    return networks,network_scores,network_errors,epoch_counts
 
-    full_model = SOLVER_INDEXES[solver]["model_type"](solver, networks, error_info)
-    full_model.calibrate(full_dataset)
 
-    return full_model
+def train_members_parallel(full_dataset,n_train,n_test,learning_config):
+    """
+    Train candidates in a process pool and accept or reject each one as it finishes.
+    Never has more candidates in flight than members still needed, so no finished work is thrown away.
+    """
+    ensemble_config = learning_config["ensemble_config"]
+    n_members = ensemble_config["n_members"]
+    n_workers = ensemble_config["n_workers"]
+
+    networks = []
+    network_errors = []
+    network_scores = []
+    epoch_counts = []
 
+    executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=limit_torch_threads,
+        initargs=(ensemble_config.get("threads_per_worker",1),),
+    )
+    pending = set()
+    i=0
+    with executor:
+        while len(networks) < n_members:
+            while len(pending) < min(n_workers,n_members-len(networks)) and i < ensemble_config["max_model_tries"]:
+                i += 1
+                print("Training ensemble member",i)
+                # Workers start from the same torch seed, so give each candidate its own
+                seed = np.random.randint(2**31)
+                pending.add(executor.submit(train_candidate,full_dataset,n_train,n_test,learning_config,seed))
+            if not pending:
+                break
+            done,pending = concurrent.futures.wait(pending,return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                this_model,model_score,model_errors,n_epochs = future.result()
+                epoch_counts.append((n_epochs,this_model is None))
+                print("Score:",model_score)
+                if this_model is None:
+                    print("Rejected early at epoch",n_epochs)
+                    continue
+                if any(m < ensemble_config["score_thresh"] for m in model_score):
+                    print("Rejected.")
+                    continue
+                print("Accepted.")
+                networks.append(this_model)
+                network_scores.append(model_score)
+                network_errors.append(model_errors)
+            print("Good models found:",len(networks))
+
+    return networks,network_scores,network_errors,epoch_counts
+
+
+def limit_torch_threads(n_threads):
+    # Keeps n_workers pool processes from oversubscribing the node
+    torch.set_num_threads(n_threads)
+
+
+def train_candidate(full_dataset,n_train,n_test,learning_config,seed=None):
+    """
+    Train one ensemble candidate on a fresh random split.
+    :return: network, score, errors on its held out split, epochs trained
+             network is None if the candidate was rejected part way through training
+    """
+    if seed is not None:
+        torch.manual_seed(seed)
+        np.random.seed(seed)
+
+    train_data, test_data = torch.utils.data.random_split(full_dataset, (n_train, n_test))
+
+    this_model,n_epochs = train_single_model(train_data, learning_config=learning_config, test_data=test_data)
+    if this_model is None:
+        return None,None,None,n_epochs
+    model_score,model_errors = get_error_info(this_model,test_data)
+    return this_model,model_score,model_errors,n_epochs
+
+
+def report_epochs_saved(epoch_counts,training_config):
+    # Rejected candidates are assumed to have needed as many epochs as the average finished one,
+    #  or the configured maximum if none finished
+    finished = [n for n,rejected in epoch_counts if not rejected]
+    stopped = [n for n,rejected in epoch_counts if rejected]
+    if not stopped:
+        return
+    if finished:
+        full_epochs = np.mean(finished)
+    else:
+        full_epochs = training_config["n_epochs"]
+    epochs_saved = sum(max(full_epochs-n,0) for n in stopped)
+    print("Early rejection stopped {} of {} candidates, about {} epochs saved".format(len(stopped),len(epoch_counts),int(epochs_saved)))
 
-def train_single_model(train_data, learning_config):
 
-    net_config = learning_config["net_config"]
-    training_config = learning_config["training_config"]
+def is_hopeless(network,outscaler,test_data,epoch,ensemble_config):
+    # True if network is too far below score_thresh for this point in training to plausibly catch up
+    for check_epoch,slack in ensemble_config.get("rejection_schedule",()):
+        if epoch == check_epoch:
+            real_scale_network = torch.nn.Sequential(*network[:], outscaler)
+            model_score,_ = get_error_info(real_scale_network,test_data)
+            return any(m < ensemble_config["score_thresh"]-slack for m in model_score)
+    return False
 
-    #Type parameters
-    activation_type = net_config["activation_type"]
-    layer_type = net_config["layer_type"]
 
+def retrain_incremental(raw_dataset,previous_model,learning_config):
+    """
+    Fine tune each member of previous_model on the new GND rows plus a replay sample of old ones.
+    :return: new model, or None if a full retrain is needed
+    """
+    solver = learning_config["solver_type"]
+    ensemble_config = learning_config["ensemble_config"]
+    incremental_config = learning_config.get("incremental_config",DEFAULT_INCREMENTAL_CONFIG)
+
+    n_total = len(raw_dataset)
+    n_old = getattr(previous_model,"n_data",None)
+    if n_old is None or n_old > n_total:
+        return None
+    n_new = n_total-n_old
+    if n_new > incremental_config["max_new_fraction"]*n_total:
+        return None
+
+    # Rows are append only, so everything past n_old arrived after the previous model was trained
+    n_replay = min(n_old,incremental_config["replay_ratio"]*max(n_new,1))
+    replay_rows = np.random.choice(n_old,n_replay,replace=False)
+    rows = np.concatenate([replay_rows,np.arange(n_old,n_total)])
+    dataset = assemble_dataset(raw_dataset[rows],solver)
+
+    n_data = len(dataset)
+    n_test = int(ensemble_config["test_fraction"]*n_data)
+    n_test = max(n_test,2)
+    n_train = n_data-n_test
+    print("Incremental new / replay / test points:",n_new,n_replay,n_test)
+    train_data, test_data = torch.utils.data.random_split(dataset, (n_train, n_test))
+
+    # Calibrate on points no member was fine tuned on: the test split plus old rows left out of the replay,
+    # sampled to the test fraction of all the data so the error bars reflect the full input range
+    unreplayed_rows = np.setdiff1d(np.arange(n_old),replay_rows)
+    n_calibration = min(len(unreplayed_rows),int(ensemble_config["test_fraction"]*n_total))
+    calibration_rows = np.concatenate([rows[np.asarray(test_data.indices)],np.random.choice(unreplayed_rows,n_calibration,replace=False)])
+    calibration_dataset = assemble_dataset(raw_dataset[calibration_rows],solver)
+
+    networks = []
+    network_errors = []
+    for i,network in enumerate(previous_model.networks):
+        print("Fine tuning ensemble member",i)
+        _,previous_errors = get_error_info(network,test_data)
+        this_model = finetune_single_model(network,train_data,learning_config)
+        model_score,model_errors = get_error_info(this_model,test_data)
+        print("Score:",model_score)
+        if any(m < ensemble_config["score_thresh"] for m in model_score):
+            print("Rejected.")
+            return None
+        if np.any(model_errors > incremental_config["degradation_tolerance"]*previous_errors):
+            print("Validation error degraded.")
+            return None
+        networks.append(this_model)
+        network_errors.append(model_errors)
+
+    error_info = np.mean(np.asarray(network_errors),axis=0)
+
+    full_model = SOLVER_INDEXES[solver]["model_type"](solver, networks, error_info, n_data=n_total,
+                                                     stacked_inference=ensemble_config.get("stacked_inference",False))
+    full_model.calibrate(calibration_dataset)
+    set_inference_precision(full_model,dataset[:][0].numpy(),learning_config)
+
+    return full_model
+
+
+def set_inference_precision(model,features,learning_config):
+    """
+    Switch model to the configured inference precision if it stays close enough to float64 on features.
+    """
+    inference_config = learning_config.get("inference_config",DEFAULT_INFERENCE_CONFIG)
+    dtype = inference_config["dtype"]
+    if dtype == torch.float64:
+        print("Inference precision: torch.float64")
+        return
+
+    reference_mean,reference_std = model.process(features,perform_column_extraction=False)
+    model.set_inference_dtype(dtype)
+    mean,std = model.process(features,perform_column_extraction=False)
+
+    # Measured against the error bars iserrok accepts, inactive columns have infinite err_info
+    with np.errstate(divide="ignore",invalid="ignore"):
+        mean_error = np.nanmax(np.abs(mean-reference_mean)/model.err_info)
+        std_error = np.nanmax(np.abs(std-reference_std)/model.err_info)
+    error = max(mean_error,std_error)
+    print("{} inference error relative to err_info: {}".format(dtype,error))
+    if not error <= inference_config["tolerance"]:
+        print("Inference error over tolerance, falling back to float64")
+        model.set_inference_dtype(torch.float64)
+    print("Inference precision: {}".format(model.inference_dtype))
+
+
+def split_validation(train_data, training_config):
     #Splitting
     n_total = len(train_data)
     n_valid = int(training_config["validation_fraction"]*n_total)
@@ -302,6 +682,23 @@ def train_single_model(train_data, learning_config):
     train_data.indices = np.asarray(train_data.indices)
     train_data, valid_data = torch.utils.data.random_split(train_data, (n_train, n_valid))
     #print(type(train_data),type(train_data[:]))
+    return train_data, valid_data
+
+
+def train_single_model(train_data, learning_config, test_data=None):
+    """
+    :param test_data: held out split used to reject the candidate early, None trains to completion
+    :return: network (None if rejected early), epochs trained
+    """
+
+    net_config = learning_config["net_config"]
+    training_config = learning_config["training_config"]
+
+    #Type parameters
+    activation_type = net_config["activation_type"]
+    layer_type = net_config["layer_type"]
+
+    train_data, valid_data = split_validation(train_data, training_config)
 
     #Normalizing
     train_features, train_labels = (train_data[:])
@@ -327,6 +724,43 @@ def train_single_model(train_data, learning_config):
 
     train_network = torch.nn.Sequential(*layers)
 
+    ensemble_config = None
+    if test_data is not None:
+        ensemble_config = learning_config["ensemble_config"]
+    return fit_network(train_network, train_data, valid_data, cost_scaler, outscaler, training_config, test_data, ensemble_config)
+
+
+def finetune_single_model(network, train_data, learning_config):
+    """
+    Continue training a copy of an already trained ensemble member.
+    Keeps the member's input and output Scaler statistics so its weights stay meaningful.
+    """
+    training_config = dict(learning_config["training_config"])
+    incremental_config = learning_config.get("incremental_config",DEFAULT_INCREMENTAL_CONFIG)
+    for key in ("n_epochs","lr","patience"):
+        training_config[key] = incremental_config[key]
+
+    train_data, valid_data = split_validation(train_data, training_config)
+
+    # Last module is the outscaler added by fit_network
+    train_network = copy.deepcopy(network[:-1])
+    outscaler = copy.deepcopy(network[-1])
+    cost_scaler = copy.deepcopy(getattr(network,"cost_scaler",None))
+    if cost_scaler is None:
+        # Members trained before fit_network kept their cost scaler
+        cost_scaler = Scaler.from_inversion(outscaler)
+
+    for module in train_network:
+        if not isinstance(module,Scaler):
+            for param in module.parameters():
+                param.requires_grad_(True)
+
+    this_model,n_epochs = fit_network(train_network, train_data, valid_data, cost_scaler, outscaler, training_config)
+    return this_model
+
+
+def fit_network(train_network, train_data, valid_data, cost_scaler, outscaler, training_config, test_data=None, ensemble_config=None):
+
     cost_fn = training_config["cost_type"]()
     opt = training_config["optimizer_type"](train_network.parameters(),lr=training_config["lr"])
     patience = training_config["patience"]
@@ -356,6 +790,9 @@ def train_single_model(train_data, learning_config):
         if boredom > 2*patience+1:
             print("Training finalized at epoch",i)
             break
+
+        if test_data is not None and is_hopeless(train_network,outscaler,test_data,i+1,ensemble_config):
+            return None,i+1
     else:
         print("Training finished due to max epoch",i)
 
@@ -365,6 +802,9 @@ def train_single_model(train_data, learning_config):
 
     train_network.load_state_dict(best_params)
     real_scale_network = torch.nn.Sequential(*train_network[:], outscaler)
+    # Plain attribute rather than a submodule so Sequential does not apply it,
+    # fine tuning reuses it instead of inverting outscaler back
+    object.__setattr__(real_scale_network,"cost_scaler",cost_scaler)
 
     for param in real_scale_network.parameters():
         param.requires_grad_(False)
@@ -373,7 +813,7 @@ def train_single_model(train_data, learning_config):
     # evaluate_dataset_errors(valid_dloader,real_scale_network,scaler=None,show="valid")
     # evaluate_dataset_errors(test_dloader,real_scale_network,scaler=None,show="test")
 
-    return real_scale_network
+    return real_scale_network,i+1
 
 
 def train_epoch(train_data,network,cost_fn,opt,scaler):
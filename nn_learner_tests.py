@@ -1,3 +1,5 @@
+import copy
+
 import torch
 
 import sklearn.metrics
@@ -28,6 +30,45 @@ def plot_errors(predicted,true,label):
     plt.show()
 
 
+def check_stacked_inference(model,features):
+    """
+    Stacked inference must match running each member on its own, to float64 rounding.
+    """
+    model = copy.deepcopy(model)
+    model.set_inference_dtype(torch.float64)
+    model.stacked_inference = False
+    loop_mean,loop_std = model.process(features,perform_column_extraction=False)
+    model.stacked_inference = True
+    model.stacked = None
+    stacked_mean,stacked_std = model.process(features,perform_column_extraction=False)
+    np.testing.assert_allclose(stacked_mean,loop_mean,rtol=1e-10,atol=1e-12*np.abs(loop_mean).max())
+    np.testing.assert_allclose(stacked_std,loop_std,rtol=1e-8,atol=1e-12*np.abs(loop_mean).max())
+
+
+def check_inference_precision(model,features):
+    """
+    float32 inference is kept only within tolerance of float64, and falls back to float64 otherwise.
+    """
+    model = copy.deepcopy(model)
+    model.set_inference_dtype(torch.float64)
+    reference_mean,reference_std = model.process(features,perform_column_extraction=False)
+
+    # Nothing is within a negative tolerance
+    strict_config = dict(inference_config=dict(dtype=torch.float32,tolerance=-1.0))
+    nn_learner.set_inference_precision(model,features,strict_config)
+    assert model.inference_dtype == torch.float64
+    mean,std = model.process(features,perform_column_extraction=False)
+    assert (mean == reference_mean).all() and (std == reference_std).all()
+
+    tolerance = nn_learner.DEFAULT_INFERENCE_CONFIG["tolerance"]
+    nn_learner.set_inference_precision(model,features,dict(inference_config=dict(dtype=torch.float32,tolerance=tolerance)))
+    if model.inference_dtype == torch.float32:
+        mean,std = model.process(features,perform_column_extraction=False)
+        active = np.isfinite(model.err_info)
+        assert (np.abs(mean-reference_mean)[:,active] <= tolerance*model.err_info[active]).all()
+        assert (np.abs(std-reference_std)[:,active] <= tolerance*model.err_info[active]).all()
+    else:
+        print("float32 inference was over tolerance for this model, checked the fallback only")
 
 
 if __name__=="__main__":
@@ -83,6 +124,12 @@ if __name__=="__main__":
 
     print("Model passed type wrapping checks")
 
+    features = raw_dataset[...,nn_learner.SOLVER_INDEXES[alInterface.SolverCode.BGK]["input_slice"]]
+    check_stacked_inference(model,features)
+    print("Model passed stacked inference checks")
+    check_inference_precision(model,features)
+    print("Model passed inference precision checks")
+
     # Batched Prediction on multiple rows
     prediction,errbar = model.process(raw_dataset)
     true = raw_dataset[...,output_location]
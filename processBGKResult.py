@@ -1,5 +1,5 @@
 import argparse
-from alInterface import  insertResult,  getGroundishTruthVersion, insertResultSlow
+from alInterface import getGroundishTruthVersion, insertResultSlow
 from glueCodeTypes import BGKOutputs, ALInterfaceMode, DatabaseMode, ResultProvenance, SolverCode, DatabaseMode
 from writeBGKLammpsScript import write_output_coeff
 from alDBHandlers import getDBHandle
@@ -104,6 +104,7 @@ def insertGroundishTruth(dbHandle, outFGS, solverCode):
         #np.savetxt("outputs.txt", outFGS)
         #Connect to DB
         dbHandle.openCursor()
+        # BGKGND_RTREE is kept in sync by the trigger initTables creates
         insString = "INSERT INTO BGKGND VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);"
         insArgs = tuple(inFGS.tolist()) + tuple(outFGS.tolist())
         dbHandle.execute(insString, insArgs)
@@ -1,4 +1,7 @@
 import copy
+import json
+import os
+import time
 import warnings
 
 import numpy as np
@@ -24,6 +27,8 @@ class Model():
         self.err_info = err_info
         self.solver = solver
         self.uq_fussyness=uq_fussyness
+        # CompiledForest used instead of the sklearn estimators once it has been verified, the estimators are kept
+        self.compiled = None
 
     def __call__(self,request_params):
         """
@@ -49,7 +54,11 @@ class Model():
         if not batched:
             request_params = request_params[np.newaxis]
 
-        results = np.asarray([tree.predict(request_params) for tree in self.forest.estimators_])
+        compiled = getattr(self,"compiled",None)
+        if compiled is not None:
+            results = compiled.predict_all(request_params)
+        else:
+            results = np.asarray([tree.predict(request_params) for tree in self.forest.estimators_])
 
         mean = results.mean(axis=0)
         std = results.std(axis=0)
@@ -116,6 +125,54 @@ class Model():
         return NotImplemented
 
 
+class CompiledForest():
+    """
+    Every tree of a fitted forest flattened into contiguous arrays.
+    All trees are walked together one level per step instead of one predict call per estimator.
+    """
+    def __init__(self,forest):
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        offsets = np.cumsum([0]+[tree.node_count for tree in trees])
+        n_nodes = offsets[-1]
+        self.roots = offsets[:-1]
+        self.max_depth = max(tree.max_depth for tree in trees)
+        self.feature = np.empty(n_nodes,dtype=np.intp)
+        self.threshold = np.empty(n_nodes,dtype=np.float64)
+        # children[2*node] is the left child and children[2*node+1] the right one
+        self.children = np.empty(2*n_nodes,dtype=np.intp)
+        self.value = np.empty((n_nodes,trees[0].n_outputs),dtype=np.float64)
+        for tree,offset in zip(trees,offsets):
+            nodes = slice(offset,offset+tree.node_count)
+            # Leaves point at themselves so walking past them is harmless
+            is_leaf = tree.children_left == -1
+            own_index = np.arange(offset,offset+tree.node_count)
+            self.children[2*offset:2*(offset+tree.node_count):2] = np.where(is_leaf,own_index,tree.children_left+offset)
+            self.children[2*offset+1:2*(offset+tree.node_count):2] = np.where(is_leaf,own_index,tree.children_right+offset)
+            self.feature[nodes] = np.where(is_leaf,0,tree.feature)
+            self.threshold[nodes] = tree.threshold
+            self.value[nodes] = tree.value[:,:,0]
+        if self.value.shape[1] == 1:
+            # Single output trees predict a flat array
+            self.value = self.value[:,0]
+
+    def predict_all(self,request_params):
+        """
+        :param request_params: array[batch, n_inputs]
+        :return: array[trees, batch, n_outputs], the same as stacking every tree's predict
+        """
+        # sklearn trees compare float32 inputs against float64 thresholds
+        request_params = np.ascontiguousarray(request_params,dtype=np.float32)
+        n_rows,n_features = request_params.shape
+        flat_params = request_params.ravel()
+        row_offsets = np.arange(n_rows)*n_features
+        nodes = np.repeat(self.roots[:,np.newaxis],n_rows,axis=1)
+        for depth in range(self.max_depth):
+            values = flat_params.take(self.feature.take(nodes)+row_offsets)
+            go_right = ~(values <= self.threshold.take(nodes))
+            nodes = self.children.take(2*nodes+go_right)
+        return self.value[nodes]
+
+
 # # BGKInputs
 # #  Temperature: float
 # #  Density: float[4]
@@ -176,11 +233,20 @@ DEFAULT_HYPERSEARCH_CONFIG=dict(
 
 
 
+#Parameters for reusing hyperparameter searches across retrains
+DEFAULT_SEARCH_CACHE_CONFIG = dict(
+    research_every = 10,     # retrains between full searches
+    oob_degradation = 0.1,   # re-search if relative OOB rmse grows by more than this fraction
+)
+
 #Bundle of all learning-related parameters
 DEFAULT_LEARNING_CONFIG = dict(
     hyper_config = DEFAULT_HYPERSEARCH_CONFIG,
     solver_type = SolverCode.BGK,
     uq_fussyness = 2./3.,
+    compiled_inference = True,   # serve from a CompiledForest when it matches sklearn exactly
+    compiled_min_speedup = 2.,   # required per request speedup over sklearn to use it
+    search_config = DEFAULT_SEARCH_CACHE_CONFIG,
 )
 
 def assemble_dataset(raw_dataset,solver_code):
@@ -194,21 +260,41 @@ def assemble_dataset(raw_dataset,solver_code):
     return features,targets
 
 #prototype, only covers ensemble uncertainties
-def retrain(db_path,learning_config=DEFAULT_LEARNING_CONFIG):
+def retrain(db_path,learning_config=DEFAULT_LEARNING_CONFIG,search_cache_path=None):
 
     solver = learning_config["solver_type"]
     raw_dataset = getAllGNDData(db_path,solver)
     full_dataset = assemble_dataset(raw_dataset,solver)
     features,labels=full_dataset
-    hypers = learning_config["hyper_config"].copy()
-    cv = hypers.pop('cv')
-    n_iter=hypers.pop('n_iter')
-    forest =sklearn.ensemble.RandomForestRegressor(oob_score=True)
-    searcher = sklearn.model_selection.RandomizedSearchCV(forest,n_iter=n_iter,cv=cv,param_distributions=hypers,
-                                                          n_jobs=-1,refit=True)
-
-    searcher.fit(features,labels)
-    forest = searcher.best_estimator_
+    search_config = learning_config.get("search_config",DEFAULT_SEARCH_CACHE_CONFIG)
+    search_cache = load_search_cache(search_cache_path)
+
+    forest = None
+    if search_cache is not None and search_cache["retrains_since_search"]+1 < search_config["research_every"]:
+        # Routine retrain: one fit with the cached hyperparameters
+        forest = sklearn.ensemble.RandomForestRegressor(oob_score=True,n_jobs=-1,**search_cache["best_params"])
+        forest.fit(features,labels)
+        oob_error = get_oob_error(forest,labels)
+        print("Refit with cached hyperparameters, relative oob rmse:",oob_error)
+        if oob_error > search_cache["oob_error"]*(1+search_config["oob_degradation"]):
+            print("OOB error degraded from",search_cache["oob_error"],"re-searching hyperparameters")
+            forest = None
+        else:
+            search_cache["retrains_since_search"] += 1
+
+    if forest is None:
+        hypers = learning_config["hyper_config"].copy()
+        cv = hypers.pop('cv')
+        n_iter=hypers.pop('n_iter')
+        forest =sklearn.ensemble.RandomForestRegressor(oob_score=True)
+        searcher = sklearn.model_selection.RandomizedSearchCV(forest,n_iter=n_iter,cv=cv,param_distributions=hypers,
+                                                              n_jobs=-1,refit=True)
+
+        searcher.fit(features,labels)
+        forest = searcher.best_estimator_
+        search_cache = dict(best_params=searcher.best_params_,retrains_since_search=0,oob_error=get_oob_error(forest,labels))
+    save_search_cache(search_cache_path,search_cache)
+
     oob_predictions = forest.oob_prediction_
     err_info = np.sqrt(np.mean((oob_predictions-labels)**2,axis=0))
     print("relative rmse:",err_info/np.std(labels,axis=0))
@@ -219,9 +305,70 @@ def retrain(db_path,learning_config=DEFAULT_LEARNING_CONFIG):
     # full_model.calibrate(full_dataset)
     model = SOLVER_INDEXES[solver]["model_type"](solver,forest,uq_fussyness=learning_config['uq_fussyness'],err_info=err_info)
     model.calibrate(full_dataset)
+    compile_forest(model,features,learning_config)
     return model
 
 
+def get_oob_error(forest,labels):
+    # Mean over outputs of the OOB rmse relative to each output's spread
+    err_info = np.sqrt(np.mean((forest.oob_prediction_-labels)**2,axis=0))
+    with np.errstate(divide="ignore",invalid="ignore"):
+        relative = err_info/np.std(labels,axis=0)
+    return float(np.nanmean(relative))
+
+
+def load_search_cache(search_cache_path):
+    """
+    :return: dict of best_params, retrains_since_search and oob_error from the last search, or None
+    """
+    if search_cache_path is None or not os.path.exists(search_cache_path):
+        return None
+    with open(search_cache_path) as cache_file:
+        return json.load(cache_file)
+
+
+def save_search_cache(search_cache_path,search_cache):
+    if search_cache_path is None:
+        return
+    # Write then rename so a crash never leaves a partial cache behind
+    tmp_path = search_cache_path+".tmp"
+    with open(tmp_path,"w") as cache_file:
+        json.dump(search_cache,cache_file)
+    os.replace(tmp_path,search_cache_path)
+
+
+def compile_forest(model,features,learning_config):
+    """
+    Switch model to a CompiledForest if it reproduces sklearn exactly on features and is faster per request.
+    """
+    if not learning_config.get("compiled_inference",False):
+        return
+    compiled = CompiledForest(model.forest)
+    reference = np.asarray([tree.predict(features) for tree in model.forest.estimators_])
+    if not np.array_equal(compiled.predict_all(features),reference):
+        print("Compiled forest does not match sklearn, keeping sklearn inference")
+        return
+
+    # Per request latency, as the glue mostly sees small batches
+    n_timed = min(len(features),20)
+    start = time.perf_counter()
+    for row in features[:n_timed]:
+        model.process(row,perform_column_extraction=False)
+    sklearn_time = (time.perf_counter()-start)/n_timed
+    model.compiled = compiled
+    start = time.perf_counter()
+    for row in features[:n_timed]:
+        model.process(row,perform_column_extraction=False)
+    compiled_time = (time.perf_counter()-start)/n_timed
+    print("Per request latency sklearn / compiled (s):",sklearn_time,compiled_time)
+    if compiled_time*learning_config.get("compiled_min_speedup",1.) > sklearn_time:
+        print("Compiled forest not fast enough, keeping sklearn inference")
+        model.compiled = None
+        return
+    # The sklearn estimators stay on the model so the artifact can be recompiled or inspected later,
+    # process just skips them while compiled is set
+
+
 
 def build_network(net_config):
     pass